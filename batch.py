@@ -0,0 +1,113 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import olap
+import render
+from main import DataSet, PATH, TIME
+
+
+def read_manifest(file):
+    """ Input files listed in a manifest, a json list or one path per line, relative to the manifest """
+    with open(file) as manifest:
+        text = manifest.read()
+    paths = json.loads(text) if file.endswith(".json") else [line.strip() for line in text.splitlines()]
+
+    base = os.path.dirname(os.path.realpath(file))
+    return [os.path.join(base, path) for path in paths if path and not path.startswith("#")]
+
+
+def expand_inputs(patterns, manifest=None):
+    """ Sorted unique input files from glob patterns and an optional manifest """
+    files = read_manifest(manifest) if manifest else list()
+    for pattern in patterns:
+        files += glob.glob(pattern)
+
+    return sorted(set(os.path.realpath(file) for file in files))
+
+
+def output_dirs(files, out_dir):
+    """ Per input output directory named after the file, suffixed when names collide """
+    dirs = dict()
+    used = set()
+    for file in files:
+        name = os.path.splitext(os.path.basename(file))[0]
+        unique = name
+        index = 1
+        while unique in used:
+            index += 1
+            unique = f"{name}_{index}"
+        used.add(unique)
+        dirs[file] = os.path.join(out_dir, unique)
+
+    return dirs
+
+
+def run_one(args):
+    """ Process one input in a worker, render its figures and return its count cube """
+    file, out_dir, cache_dir, chunksize = args
+    os.makedirs(out_dir, exist_ok=True)
+
+    dataset = DataSet(file, out_dir, cache_dir=cache_dir, chunksize=chunksize)
+    dataset.process()
+    render.render_all(dataset.race_hist_specs() + dataset.age_hist_specs() + dataset.gender_hist_specs())
+
+    return file, dataset.count_cube
+
+
+def merge_counts(total, cube):
+    """ Add one input's count cube into a running total """
+    if total is None:
+        return olap.CountCube(cube.counts.copy(), cube.dims)
+    return total.add(cube.counts)
+
+
+def write_rollup(total, out_dir):
+    """ Roll-up figures and crosstab csvs from merged counts """
+    os.makedirs(out_dir, exist_ok=True)
+    rollup = DataSet.from_cube(total, out_dir)
+    for group in ["race", "age", "gender"]:
+        for outcome in ["manner", "custody"]:
+            rollup.crosstab(group, outcome).to_csv(os.path.join(out_dir, f"crosstab_{group}_{outcome}.csv"))
+    render.render_all(rollup.race_hist_specs() + rollup.age_hist_specs() + rollup.gender_hist_specs())
+
+    return rollup
+
+
+def run_batch(files, out_dir, processes, cache_dir=None, chunksize=None):
+    """ Process inputs concurrently, one data set per worker, and merge their counts """
+    dirs = output_dirs(files, out_dir)
+    jobs = [(file, dirs[file], cache_dir, chunksize) for file in files]
+
+    total = None
+    with multiprocessing.Pool(max(1, min(processes, len(jobs)))) as pool:
+        for file, cube in pool.imap_unordered(run_one, jobs):
+            print(f"Processed {file} -> {dirs[file]}")
+            total = merge_counts(total, cube)
+
+    return write_rollup(total, os.path.join(out_dir, "rollup"))
+
+
+def main(argv=None):
+    """ Main """
+    parser = argparse.ArgumentParser(description="Run the Deaths In Custody analysis over many input files")
+    parser.add_argument("inputs", nargs="*", help="input csv files or glob patterns")
+    parser.add_argument("--manifest", help="json list or text file of input paths")
+    parser.add_argument("--processes", type=int, default=round(multiprocessing.cpu_count() * .75))
+    parser.add_argument("--chunksize", type=int, default=None, help="stream each input in chunks of this many rows")
+    parser.add_argument("--no-cache", action="store_true", help="re-parse and re-bin every input")
+    args = parser.parse_args(argv)
+
+    files = expand_inputs(args.inputs, args.manifest)
+    if not files:
+        parser.error("no input files matched")
+
+    out_dir = os.path.join(os.path.join(os.path.join(PATH, "out"), "DeathInCustody"), f"batch_{TIME}")
+    cache_dir = None if args.no_cache else os.path.join(PATH, "cache")
+    rollup = run_batch(files, out_dir, args.processes, cache_dir, args.chunksize)
+    print(f"Rolled up {len(files)} files into {rollup.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import render
+import synth
+from binning import DIMENSIONS
+from main import DataSet
+
+
+# GLOBAL VARIABLES
+PATH = os.path.dirname(os.path.realpath(__file__))
+BENCH_DIR = os.path.join(os.path.join(PATH, "out"), "bench")
+HISTORY_FILE = os.path.join(BENCH_DIR, "history.json")
+CLI_FILE = os.path.join(PATH, "cli.py")
+
+
+def measure(func, repeat=1):
+    """ Best wall time over repeats, then peak traced memory of one more run """
+    seconds = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    # Traced separately so tracemalloc overhead never lands in the timings
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return dict({"seconds": min(seconds), "peak_mb": peak / 1e6})
+
+
+def pipeline_stages(file, out_dir):
+    """ Ordered (name, func) pipeline stages, each reusing the previous stage's state """
+    dataset = DataSet(file, out_dir)
+
+    def ingest():
+        dataset.csv = pd.read_csv(file)
+
+    def binning():
+        dataset.process()
+        for dim in DIMENSIONS:
+            dataset.codes(dim)
+
+    def counting():
+        # Recount the cube each run, otherwise repeats only time roll-ups of the first run's cube
+        dataset._cube = None
+        for group in ["race", "age", "gender"]:
+            for outcome in ["manner", "custody"]:
+                dataset.crosstab(group, outcome)
+
+    def reduce():
+        dataset.reduce().crosstab("race", "manner")
+
+    def rendering():
+        render.render_all(dataset.race_hist_specs() + dataset.age_hist_specs() + dataset.gender_hist_specs())
+
+    def streaming():
+        DataSet(file, out_dir, chunksize=100_000).process()
+
+    # Fresh interpreters, so import cost is part of the time, the startup a user waits for
+    def startup_help():
+        subprocess.run([sys.executable, CLI_FILE, "--help"], check=True, capture_output=True)
+
+    def startup_stats():
+        subprocess.run([sys.executable, CLI_FILE, "stats", "--file", file, "--no-cache"], check=True,
+                       capture_output=True)
+
+    return [("ingest", ingest), ("binning", binning), ("counting", counting), ("reduce", reduce),
+            ("render", rendering), ("stream", streaming), ("startup_help", startup_help),
+            ("startup_stats", startup_stats)]
+
+
+def synthetic_file(rows, seed=0):
+    """ Synthetic csv of a size, generated once and reused across runs """
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    file = os.path.join(BENCH_DIR, f"synthetic_{rows}_{seed}.csv")
+    if not os.path.isfile(file):
+        synth.generate(file, rows, seed)
+    return file
+
+
+def git_commit():
+    """ Current commit id, None outside a git checkout """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PATH, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(rows, repeat=1, skip=()):
+    """ Benchmark every pipeline stage on a synthetic file of rows """
+    file = synthetic_file(rows)
+    results = dict()
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name, func in pipeline_stages(file, out_dir):
+            if name not in skip:
+                results[name] = measure(func, repeat)
+
+    return dict({"time": datetime.datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+                 "rows": rows, "repeat": repeat, "stages": results})
+
+
+def load_history(file=HISTORY_FILE):
+    """ Past benchmark records, oldest first """
+    if not os.path.isfile(file):
+        return list()
+    with open(file) as history_file:
+        return json.load(history_file)
+
+
+def save_history(records, file=HISTORY_FILE):
+    """ Append benchmark records to the history file """
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    history = load_history(file) + records
+    with open(file, "w") as history_file:
+        json.dump(history, history_file, indent=4)
+
+
+def report(record, history):
+    """ Table of a record's stages with change against the last run of the same size """
+    previous = next((past for past in reversed(history) if past["rows"] == record["rows"]), None)
+    table = pd.DataFrame(record["stages"]).T
+    if previous:
+        before = pd.DataFrame(previous["stages"]).T.reindex(table.index)
+        table["seconds_change"] = table["seconds"] / before["seconds"] - 1
+        table["peak_mb_change"] = table["peak_mb"] / before["peak_mb"] - 1
+
+    return table
+
+
+def main(argv=None):
+    """ Main """
+    parser = argparse.ArgumentParser(description="Benchmark the Deaths In Custody pipeline stages")
+    parser.add_argument("--rows", default="10k", help=f"comma separated row counts or {', '.join(synth.SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, best is kept")
+    parser.add_argument("--skip", default="", help="comma separated stages to skip, e.g. render,stream")
+    parser.add_argument("--history", default=HISTORY_FILE, help="json file the results are appended to")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    records = list()
+    for size in args.rows.split(","):
+        record = run(synth.SIZES.get(size) or int(size), args.repeat, args.skip.split(","))
+        print(f'Rows: {record["rows"]}')
+        print(report(record, history))
+        records.append(record)
+
+    save_history(records, args.history)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+
+# GLOBAL VARIABLES
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "binning.json")
+DIMENSIONS = ["race", "gender", "age", "manner", "custody"]
+OUTCOMES = ["manner", "custody"]
+TIME_DIMENSIONS = ["year", "month"]
+
+# Category codes are small ints, the code one past the last category marks a missing label
+CODE_DTYPE = np.uint8
+# Months outgrow uint8 past 21 years, so time dimensions get wider codes
+PERIOD_DTYPE = np.uint16
+
+
+def period_labels(spec):
+    """ Year labels, or year-month labels when the spec has a month column, from first to last year """
+    years = range(spec["first"], spec["last"] + 1)
+    if "month_column" in spec:
+        labels = [f"{year}-{month:02d}" for year in years for month in range(1, 13)]
+    else:
+        labels = [str(year) for year in years]
+
+    # The missing code sits one past the last label, so it must still fit the code dtype
+    if len(labels) >= np.iinfo(PERIOD_DTYPE).max:
+        raise ValueError(f'{len(labels)} periods from {spec["first"]} to {spec["last"]} overflow '
+                         f'{PERIOD_DTYPE.__name__}')
+    return labels
+
+
+def load_config(file=None):
+    """ Loads binning config from json, defaults to binning.json, period categories are filled in """
+    with open(file or CONFIG_FILE) as config_file:
+        config = json.load(config_file)
+
+    for spec in config.values():
+        if isinstance(spec, dict) and "first" in spec and "categories" not in spec:
+            spec["categories"] = period_labels(spec)
+    return config
+
+
+def bin_labels(column, spec):
+    """ Codes of a label column binned via the spec's group mapping """
+    categories = spec["categories"]
+    missing = len(categories)
+
+    # Map each source label to its group, labels without a group map to themselves
+    mapping = {label: label for label in categories}
+    for group, labels in spec.get("groups", dict()).items():
+        for label in labels:
+            mapping[label] = group
+
+    # Resolve only the unique values, then broadcast back over rows
+    codes, uniques = pd.factorize(column)
+    lookup = {label: code for code, label in enumerate(categories)}
+    unique_codes = np.array([lookup.get(mapping.get(label), missing) for label in uniques] + [missing],
+                            dtype=CODE_DTYPE)
+
+    return unique_codes[codes]
+
+
+def bin_age(column, spec):
+    """ Codes of an age column binned via the spec's edges """
+    categories = spec["categories"]
+    ages = pd.to_numeric(column, errors="coerce").to_numpy(dtype=float)
+
+    # Ages <= edge land in that edge's bin, unparsable ages (e.g. "Unk") are unknown
+    codes = np.searchsorted(np.array(spec["edges"], dtype=float), ages, side="left").astype(CODE_DTYPE)
+    codes[np.isnan(ages)] = categories.index(spec["unknown"])
+
+    return codes
+
+
+def bin_period(frame, spec):
+    """ Codes of a year, or year and month, column pair counted from the spec's first year """
+    missing = len(spec["categories"])
+    years = pd.to_numeric(frame[spec["column"]], errors="coerce").to_numpy(dtype=float)
+    codes = years - spec["first"]
+    if "month_column" in spec:
+        months = pd.to_numeric(frame[spec["month_column"]], errors="coerce").to_numpy(dtype=float)
+        codes = np.where((months >= 1) & (months <= 12), codes * 12 + months - 1, np.nan)
+
+    # Unparsable dates are missing, years outside the configured ones as well but with a warning
+    outside = (years < spec["first"]) | (years > spec["last"])
+    if outside.any():
+        warnings.warn(f'{outside.sum()} rows with {spec["column"]} from {years[outside].min():.0f} to '
+                      f'{years[outside].max():.0f} fall outside {spec["first"]}-{spec["last"]} and count as missing, '
+                      f'widen "first" and "last" in the binning config to keep them')
+    valid = (codes >= 0) & (codes < missing)
+    return np.where(valid, np.nan_to_num(codes), missing).astype(PERIOD_DTYPE)
+
+
+def bin_dimension(frame, config, dim):
+    """ Bins one configured dimension of a frame into a code array """
+    spec = config[dim]
+    if "first" in spec:
+        return bin_period(frame, spec)
+    if "edges" in spec:
+        return bin_age(frame[spec["column"]], spec)
+    return bin_labels(frame[spec["column"]], spec)
+
+
+def bin_frame(frame, config):
+    """ Bins every configured dimension of a frame, returns dict of code arrays """
+    return {dim: bin_dimension(frame, config, dim) for dim in DIMENSIONS}
+
+
+def to_categorical(codes, categories):
+    """ Categorical labels of a code array, only built at render or export time """
+    codes = np.asarray(codes).astype(np.int16)
+    codes[codes == len(categories)] = -1
+
+    return pd.Categorical.from_codes(codes, categories)
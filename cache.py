@@ -0,0 +1,112 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+
+# GLOBAL VARIABLES
+CACHE_FORMAT = 3
+BLOCK_SIZE = 1 << 20
+
+
+def file_hash(file):
+    """ Sha256 of a file's content, read in blocks """
+    digest = hashlib.sha256()
+    with open(file, "rb") as source:
+        for block in iter(lambda: source.read(BLOCK_SIZE), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def config_hash(config):
+    """ Sha256 of a binning config, so any grouping edit changes the key """
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def cache_key(file, config):
+    """ Cache key from source content, binning config and cache format """
+    return f'{file_hash(file)[:24]}_{config_hash(config)[:12]}_v{CACHE_FORMAT}'
+
+
+@contextlib.contextmanager
+def swap_in(path, suffix="", directory=False):
+    """ Temp path beside a file or directory, renamed over it once written so readers never see a partial one """
+    temp_path = f"{path.rstrip(os.sep)}.{os.getpid()}.tmp{suffix}"
+    if directory:
+        os.makedirs(temp_path, exist_ok=True)
+    try:
+        yield temp_path
+    except BaseException:
+        if directory:
+            shutil.rmtree(temp_path, ignore_errors=True)
+        elif os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if directory:
+        shutil.rmtree(path, ignore_errors=True)
+    os.replace(temp_path, path)
+
+
+def load(cache_dir, key):
+    """ Loads a cached entry as (meta, codes), None on a miss """
+    entry_dir = os.path.join(cache_dir, key)
+    if not os.path.isfile(os.path.join(entry_dir, "meta.json")):
+        return None
+
+    with open(os.path.join(entry_dir, "meta.json")) as meta_file:
+        meta = json.load(meta_file)
+
+    # Codes are memory mapped, pages are only read when a column is used
+    codes = dict()
+    for dim in meta["categories"]:
+        file = os.path.join(entry_dir, f"{dim}.npy")
+        if os.path.isfile(file):
+            codes[dim] = np.load(file, mmap_mode="r")
+
+    return meta, codes
+
+
+def load_array(cache_dir, key, name):
+    """ One stored array of an entry, e.g. its count cube, None when not stored yet """
+    file = os.path.join(cache_dir, key, f"{name}.npy")
+    return np.load(file) if os.path.isfile(file) else None
+
+
+def store(cache_dir, key, meta, codes):
+    """ Writes an entry and drops older entries built from the same source file """
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_dir = os.path.join(cache_dir, key)
+    with swap_in(entry_dir, directory=True) as temp_dir:
+        for dim, values in codes.items():
+            np.save(os.path.join(temp_dir, f"{dim}.npy"), values)
+        with open(os.path.join(temp_dir, "meta.json"), "w") as meta_file:
+            json.dump(meta, meta_file, indent=4)
+
+    # Invalidate stale entries: same source file, older content or config
+    for name in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, name, "meta.json")
+        if name == key or not os.path.isfile(meta_path):
+            continue
+        with open(meta_path) as meta_file:
+            if json.load(meta_file).get("source") == meta.get("source"):
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def store_column(cache_dir, key, meta, dim, values):
+    """ Adds one column to an entry, columns are binned and stored on first use """
+    entry_dir = os.path.join(cache_dir, key)
+    if not os.path.isfile(os.path.join(entry_dir, "meta.json")):
+        store(cache_dir, key, meta, {dim: values})
+        return
+
+    with swap_in(os.path.join(entry_dir, f"{dim}.npy"), ".npy") as temp_file:
+        np.save(temp_file, values)
+
+
+def clear(cache_dir):
+    """ Removes every cached entry """
+    shutil.rmtree(cache_dir, ignore_errors=True)
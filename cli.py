@@ -0,0 +1,149 @@
+import argparse
+import os
+import sys
+
+
+# GLOBAL VARIABLES
+PATH = os.path.dirname(os.path.realpath(__file__))
+DATA_FILE = os.path.join(os.path.join(PATH, "data"), "DeathInCustody_2005-2020_20210603.csv")
+# Choices repeated from main and sampling, so building the parser imports neither
+JUSTIFIED = 'Homicide Justified (Law Enforcement Staff)'
+GROUPS = ["race", "age", "gender"]
+OUTCOMES = ["manner", "custody"]
+SAMPLING = ["random", "proportional", "neyman", "weighted"]
+# Subcommands handled by another module's main(argv), given every argument after the subcommand
+FORWARDED = dict({"run": ("main", "full pipeline: every statistic and figure into a new output folder"),
+                  "batch": ("batch", "run many input files over one worker pool and roll their counts up"),
+                  "serve": ("serve", "serve crosstab, rate and chart queries over http"),
+                  "bench": ("bench", "benchmark the pipeline stages and startup on synthetic data")})
+
+
+def load(args):
+    """ Processed data set of the input file, binned columns and counts from the cache when unchanged """
+    from main import DataSet
+
+    dataset = DataSet(args.file, None, cache_dir=None if args.no_cache else os.path.join(PATH, "cache"),
+                      chunksize=getattr(args, "chunksize", None))  # reduce needs every row, so it never streams
+    dataset.process()
+    return dataset
+
+
+def stats(args):
+    """ Print counts, summary statistics, rates and independence tests, nothing is written """
+    import disparity
+    import rates
+    import stats as summary
+
+    dataset = load(args)
+    # Justified homicides for manner, as in the full run, else the outcome's first category
+    labels = dataset.labels(args.outcome)
+    label = args.label or (JUSTIFIED if args.outcome == "manner" else labels[0])
+    if label not in labels:
+        args.error(f'argument --label: {label} is not a {args.outcome} label, one of {", ".join(labels)}')
+
+    print(dataset.crosstab(args.group, args.outcome))
+    described = summary.describe(dataset, args.group, args.outcome, label)
+    print(f'Mean: {described["mean"]}')
+    print(f'Median: {described["median"]}')
+    print(f'Mode: {described["mode"]}')
+    print(rates.rates(dataset, args.group, args.outcome).summary(label))
+    if args.tests:
+        print(disparity.battery(dataset, [args.group], [args.outcome], args.permutations, seed=1).summary)
+
+
+def hist(args):
+    """ Render the histograms of some groups into a new output folder """
+    import results
+    from main import TIME, render_all
+
+    groups = args.groups or GROUPS
+    unknown = [group for group in groups if group not in GROUPS]
+    if unknown:
+        args.error(f'argument groups: invalid choice {", ".join(unknown)}, one of {", ".join(GROUPS)}')
+
+    dataset = load(args)
+    dataset.out_dir = os.path.join(os.path.join(os.path.join(PATH, "out"), "DeathInCustody"), TIME)
+    os.makedirs(dataset.out_dir)
+
+    specs = list()
+    for group in groups:
+        specs += getattr(dataset, f"{group}_hist_specs")()
+    store = None if args.no_cache else results.ResultStore(os.path.join(os.path.join(PATH, "cache"), "results"))
+    for path in render_all(specs, fast=args.fast_render, store=store):
+        print(path)
+
+
+def reduce(args):
+    """ Print counts and summary statistics of a sample, nothing is written """
+    import stats as summary
+
+    reduced = load(args).reduce(args.frac, args.seed, args.sampling, args.by, ("manner", JUSTIFIED))
+    print(reduced.value_counts(args.by))
+    described = summary.describe(reduced, "race", "manner", JUSTIFIED)
+    print(f'Mean: {described["mean"]}')
+    print(f'Median: {described["median"]}')
+    print(f'Mode: {described["mode"]}')
+
+
+def forward(args):
+    """ Hand the remaining arguments to another module's main """
+    module = __import__(FORWARDED[args.command][0])
+    module.main(args.rest)
+
+
+def parser():
+    """ Argument parser of every subcommand, built without importing any of them """
+    root = argparse.ArgumentParser(description="Deaths In Custody statistics")
+    commands = root.add_subparsers(dest="command", required=True)
+
+    # Input options shared by the subcommands reading the data set, streaming only where counts are enough
+    source = argparse.ArgumentParser(add_help=False)
+    source.add_argument("--file", default=DATA_FILE, help="input csv")
+    source.add_argument("--no-cache", action="store_true", help="re-parse and re-bin the csv, ignoring the cache")
+    stream = argparse.ArgumentParser(add_help=False)
+    stream.add_argument("--chunksize", type=int, default=None, help="stream the csv in chunks, keeping only counts")
+
+    command = commands.add_parser("stats", parents=[source, stream], help="print counts, statistics, rates and tests")
+    command.add_argument("--group", choices=GROUPS, default="race")
+    command.add_argument("--outcome", choices=OUTCOMES, default="manner")
+    command.add_argument("--label", default=None,
+                         help=f"outcome label of the rates and statistics, defaults to {JUSTIFIED} for manner and "
+                              f"the first category otherwise")
+    command.add_argument("--tests", action="store_true", help="also run chi-square independence tests")
+    command.add_argument("--permutations", type=int, default=0, help="permutation test shuffles")
+    command.set_defaults(func=stats, error=command.error)
+
+    # Validated in hist, argparse checks a list default of a nargs="*" positional against its choices
+    command = commands.add_parser("hist", parents=[source, stream], help="render histograms into a new output folder")
+    command.add_argument("groups", nargs="*", default=None, help=f'groups to plot, any of {", ".join(GROUPS)}, '
+                                                                 f'defaults to all')
+    command.add_argument("--fast-render", action="store_true", help="write pngs with low compression")
+    command.set_defaults(func=hist, error=command.error)
+
+    command = commands.add_parser("reduce", parents=[source], help="print statistics of a sample")
+    command.add_argument("--frac", type=float, default=0.5)
+    command.add_argument("--seed", type=int, default=1)
+    command.add_argument("--sampling", choices=SAMPLING, default="random")
+    command.add_argument("--by", choices=GROUPS, default="race", help="strata or weights column")
+    command.set_defaults(func=reduce)
+
+    for name, (_, description) in FORWARDED.items():
+        command = commands.add_parser(name, add_help=False, help=f"{description}, see {name} --help")
+        command.set_defaults(func=forward)
+
+    return root
+
+
+def main(argv=None):
+    """ Main """
+    # Headless in every subcommand, whatever backend the environment asks for
+    os.environ["MPLBACKEND"] = "Agg"
+    root = parser()
+    args, args.rest = root.parse_known_args(argv)
+    if args.rest and args.func is not forward:
+        root.error(f'unrecognized arguments: {" ".join(args.rest)}')
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import math
+import multiprocessing
+import numpy as np
+import pandas as pd
+import binning
+import resample
+
+
+# GLOBAL VARIABLES
+GROUPS = ["race", "age", "gender"]
+MAX_ITER = 1000
+EPS = 1e-15
+TINY = 1e-300
+
+
+def gamma_q(a, x):
+    """ Regularized upper incomplete gamma Q(a, x), by series below a + 1 and continued fraction above """
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+
+    if x < a + 1:
+        term = total = 1 / a
+        shape = a
+        for _ in range(MAX_ITER):
+            shape += 1
+            term *= x / shape
+            total += term
+            if abs(term) < abs(total) * EPS:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefix))
+
+    # Modified Lentz evaluation of the continued fraction
+    b = x + 1 - a
+    c = 1 / TINY
+    d = 1 / b
+    fraction = d
+    for step in range(1, MAX_ITER):
+        an = -step * (step - a)
+        b += 2
+        d = an * d + b
+        d = TINY if abs(d) < TINY else d
+        c = b + an / c
+        c = TINY if abs(c) < TINY else c
+        d = 1 / d
+        fraction *= d * c
+        if abs(d * c - 1) < EPS:
+            break
+    return math.exp(log_prefix) * fraction
+
+
+def chi2_sf(stat, df):
+    """ Upper tail probability of chi-square statistics, elementwise, nan without degrees of freedom """
+    return np.array([gamma_q(k / 2, x / 2) if k > 0 else np.nan
+                     for x, k in zip(np.ravel(stat), np.ravel(df))]).reshape(np.shape(stat))
+
+
+def normal_sf(z):
+    """ Two sided standard normal tail probability, elementwise """
+    return np.vectorize(math.erfc, otypes=[float])(np.abs(z) / math.sqrt(2))
+
+
+def stack_tables(tables):
+    """ Count matrices zero padded into one (tables, rows, columns) array """
+    stack = np.zeros((len(tables), max(table.shape[0] for table in tables), max(table.shape[1] for table in tables)))
+    for index, table in enumerate(tables):
+        stack[index, :table.shape[0], :table.shape[1]] = table
+    return stack
+
+
+def expected_counts(stack):
+    """ Expected counts under independence of every stacked table, from its margins """
+    total = stack.sum(axis=(-2, -1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return stack.sum(axis=-1)[..., :, None] * stack.sum(axis=-2)[..., None, :] / total[..., None, None]
+
+
+def chi_square(stack, expected):
+    """ Pearson statistic of every stacked table, empty rows and columns contribute nothing """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(expected > 0, (stack - expected) ** 2 / expected, 0).sum(axis=(-2, -1))
+
+
+def adjusted_residuals(stack, expected):
+    """ Standardized (adjusted) residual of every cell, standard normal under independence """
+    total = stack.sum(axis=(-2, -1))[..., None, None]
+    row_share = stack.sum(axis=-1)[..., :, None] / total
+    col_share = stack.sum(axis=-2)[..., None, :] / total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (stack - expected) / np.sqrt(expected * (1 - row_share) * (1 - col_share))
+
+
+def permutation_block(args):
+    """ Chi-square statistics of one table under random shuffles of its outcome codes, used per worker """
+    seed, permutations, table = args
+    rng = np.random.default_rng(seed)
+    rows, cols = table.shape
+    expected = expected_counts(table)
+
+    # Rows rebuilt from the table as (group, outcome) codes, a shuffle keeps both margins
+    cells = np.repeat(np.arange(rows * cols), table.ravel().astype(np.int64))
+    group = cells - cells % cols
+    outcome = cells % cols
+
+    step = max(1, resample.MAX_BLOCK // max(len(cells), 1))
+    stats = list()
+    for start in range(0, permutations, step):
+        count = min(step, permutations - start)
+        shuffled = rng.permuted(np.tile(outcome, (count, 1)), axis=1)
+        offset = np.arange(count, dtype=np.int64)[:, None] * (rows * cols)
+        counts = np.bincount((offset + group + shuffled).ravel(), minlength=count * rows * cols)
+        stats.append(chi_square(counts.reshape(count, rows, cols), expected))
+
+    return np.concatenate(stats) if stats else np.zeros(0)
+
+
+def permutation_stats(tables, permutations, seed=None, processes=1):
+    """ Permutation chi-square statistics per table, blocks of every table fanned out over one pool """
+    # Seeded blocks per table, only their scheduling depends on processes
+    blocks = resample.seeded_blocks(permutations, seed, len(tables))
+    jobs = [(block_seed, block_size, table) for table, table_blocks in zip(tables, blocks)
+            for block_seed, block_size in table_blocks]
+
+    processes = max(1, min(processes, len(jobs)))
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            stats = pool.map(permutation_block, jobs, chunksize=1)
+    else:
+        stats = [permutation_block(job) for job in jobs]
+
+    count = len(blocks[0]) if blocks else 0
+    return [np.concatenate(stats[index * count:(index + 1) * count] or [np.zeros(0)]) for index in range(len(tables))]
+
+
+class Battery:
+    """ Class holding independence tests of every group x outcome table """
+
+    def __init__(self, tables, summary, residuals):
+        """ Constructor for Battery """
+        self.tables = tables
+        self.summary = summary
+        self.residuals = residuals
+
+    def residual_tests(self, group_col, outcome_col, alpha=0.05):
+        """ Residual, p value and Bonferroni flag of every cell of one table """
+        residuals = self.residuals[(group_col, outcome_col)]
+        table = residuals.stack().rename("residual").to_frame()
+        table["p_value"] = normal_sf(table["residual"].to_numpy())
+        table["significant"] = table["p_value"] < alpha / table["residual"].notna().sum()
+
+        return table
+
+
+def battery(dataset, groups=GROUPS, outcomes=binning.OUTCOMES, permutations=0, seed=None, processes=1):
+    """ Chi-square, Cramer's V and residuals of every group x outcome table in one batched pass """
+    pairs = [(group, outcome) for group in groups for outcome in outcomes]
+    tables = {pair: dataset.crosstab(*pair) for pair in pairs}
+
+    # Every table padded into one array, so each statistic is a single vectorized expression
+    stack = stack_tables([table.to_numpy() for table in tables.values()])
+    expected = expected_counts(stack)
+    stat = chi_square(stack, expected)
+    rows = (stack.sum(axis=2) > 0).sum(axis=1)
+    cols = (stack.sum(axis=1) > 0).sum(axis=1)
+    df = (rows - 1) * (cols - 1)
+    total = stack.sum(axis=(1, 2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cramers_v = np.sqrt(stat / (total * np.minimum(rows - 1, cols - 1)))
+
+    summary = pd.DataFrame({"n": total.astype(np.int64), "chi2": stat, "df": df, "p_value": chi2_sf(stat, df),
+                            "cramers_v": cramers_v}, index=pd.MultiIndex.from_tuples(pairs, names=["group", "outcome"]))
+
+    # Permutation p values count shuffles at least as extreme, plus the observed table
+    if permutations:
+        null = permutation_stats([table.to_numpy() for table in tables.values()], permutations, seed, processes)
+        summary["permutation_p"] = [(1 + np.sum(values >= observed * (1 - 1e-12))) / (1 + permutations)
+                                    for values, observed in zip(null, stat)]
+
+    residual_stack = adjusted_residuals(stack, expected)
+    residuals = {pair: pd.DataFrame(residual_stack[index, :table.shape[0], :table.shape[1]], index=table.index,
+                                    columns=table.columns) for index, (pair, table) in enumerate(tables.items())}
+
+    return Battery(tables, summary, residuals)
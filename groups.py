@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class GroupIndex:
+    """ Class holding sorted row ids of every category, per binned dimension """
+
+    def __init__(self, dataset, dims):
+        """ Constructor for GroupIndex, one stable counting sort per dimension """
+        self.size = None
+        self.labels = dict()
+        self.rows = dict()
+
+        for dim in dims:
+            codes = dataset.codes(dim)
+            labels = list(dataset.labels(dim))
+            self.size = len(codes)
+
+            # Stable sort keeps row ids ascending inside each category, missing codes sort last
+            order = np.argsort(codes, kind="stable").astype(np.int32)
+            bounds = np.cumsum(np.bincount(codes, minlength=len(labels) + 1))
+            self.labels[dim] = labels
+            self.rows[dim] = dict(zip(labels, np.split(order, bounds[:-1])))
+
+    def group(self, dim, labels):
+        """ Sorted row ids of one label, or the union of a list of labels """
+        if isinstance(labels, str):
+            return self.rows[dim][labels]
+        return np.sort(np.concatenate([self.rows[dim][label] for label in labels]))
+
+    def select(self, **filters):
+        """ Sorted row ids matching every dim=label filter, intersecting smallest groups first """
+        if not filters:
+            return np.arange(self.size, dtype=np.int32)
+
+        groups = sorted((self.group(dim, labels) for dim, labels in filters.items()), key=len)
+        rows = groups[0]
+        for group in groups[1:]:
+            rows = np.intersect1d(rows, group, assume_unique=True)
+
+        return rows
+
+    def count(self, **filters):
+        """ Number of rows matching every dim=label filter """
+        return len(self.select(**filters))
@@ -0,0 +1,69 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import cache
+import olap
+
+
+# GLOBAL VARIABLES
+STATE_FORMAT = 2
+
+
+def row_hashes(frame):
+    """ Stable uint64 hash of every row's values, independent of row position """
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def lookup(known_hashes, known_counts, hashes):
+    """ Times each hash occurs in a sorted unique hash table, 0 when absent """
+    if not len(known_hashes):
+        return np.zeros(len(hashes), dtype=np.int64)
+    position = np.minimum(np.searchsorted(known_hashes, hashes), len(known_hashes) - 1)
+    return np.where(known_hashes[position] == hashes, known_counts[position], 0)
+
+
+def new_rows(hashes, known_hashes, known_counts):
+    """ Positions of rows not seen before, a hash stored k times skips its first k rows """
+    order = np.argsort(hashes, kind="stable")
+    sorted_hashes = hashes[order]
+
+    # Occurrence rank of each row within its run of equal hashes
+    starts = np.flatnonzero(np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]])
+    rank = np.arange(len(hashes)) - np.repeat(starts, np.diff(np.r_[starts, len(hashes)]))
+
+    return np.sort(order[rank >= lookup(known_hashes, known_counts, sorted_hashes)])
+
+
+def removed_rows(hashes, known_hashes, known_counts):
+    """ Number of stored rows missing from the new release """
+    unique, counts = np.unique(hashes, return_counts=True)
+    return int(np.clip(known_counts - lookup(unique, counts, known_hashes), 0, None).sum())
+
+
+def load_state(state_dir, config):
+    """ Stored count cube and row hashes, None when missing or built with another config """
+    meta_file = os.path.join(state_dir, "meta.json")
+    if not os.path.isfile(meta_file):
+        return None
+    with open(meta_file) as source:
+        meta = json.load(source)
+    if meta["format"] != STATE_FORMAT or meta["config"] != cache.config_hash(config):
+        return None
+
+    cube = olap.CountCube.load(os.path.join(state_dir, olap.CUBE_FILE))
+    hashes = np.load(os.path.join(state_dir, "hashes.npy"))
+    multiplicity = np.load(os.path.join(state_dir, "hash_counts.npy"))
+
+    return dict({"meta": meta, "cube": cube, "hashes": hashes, "hash_counts": multiplicity})
+
+
+def save_state(state_dir, config, cube, hashes, multiplicity, sources):
+    """ Write the count cube and row hashes as one state directory """
+    with cache.swap_in(state_dir, directory=True) as temp_dir:
+        cube.save(os.path.join(temp_dir, olap.CUBE_FILE))
+        np.save(os.path.join(temp_dir, "hashes.npy"), hashes)
+        np.save(os.path.join(temp_dir, "hash_counts.npy"), multiplicity)
+        with open(os.path.join(temp_dir, "meta.json"), "w") as meta_file:
+            json.dump(dict({"format": STATE_FORMAT, "config": cache.config_hash(config),
+                            "rows": int(multiplicity.sum()), "sources": sources}), meta_file, indent=4)
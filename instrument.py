@@ -0,0 +1,118 @@
+import contextlib
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+
+# GLOBAL VARIABLES
+ENV_VAR = "DIC_PROFILE"
+REPORT_FILE = "profile.json"
+
+
+def cpu_seconds():
+    """ Cpu time of this process and its reaped children, e.g. finished pool workers """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process so far, ru_maxrss is in bytes on macOS and kilobytes elsewhere """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+
+
+class Stage(contextlib.ContextDecorator):
+    """ Context manager and decorator timing one named stage of a profiler """
+
+    def __init__(self, profiler, name):
+        """ Constructor for Stage """
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        """ Start the stage clocks """
+        self.profiler.start(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        """ Stop the stage clocks and record it """
+        self.profiler.stop()
+        return False
+
+
+class Profiler:
+    """ Class recording wall time, cpu time and peak memory per pipeline stage """
+
+    def __init__(self, enabled=None):
+        """ Constructor for Profiler, enabled by the DIC_PROFILE env var by default """
+        self.enabled = os.environ.get(ENV_VAR, "") not in ("", "0") if enabled is None else enabled
+        self.stages = list()
+        self.stack = list()
+
+    def stage(self, name):
+        """ Stage usable as `with profiler.stage(name):` or `@profiler.stage(name)` """
+        return Stage(self, name)
+
+    def start(self, name):
+        """ Open a stage, nested stages are recorded separately and counted in their parent """
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        # Fold the running peak into the open parent before resetting it for this stage
+        if self.stack:
+            self.stack[-1]["traced_peak"] = max(self.stack[-1]["traced_peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+        # Recorded on open, so parents list before their nested stages
+        record = dict({"stage": name, "depth": len(self.stack)})
+        self.stages.append(record)
+        self.stack.append(dict({"record": record, "traced_peak": 0, "wall": time.perf_counter(),
+                                "cpu": cpu_seconds()}))
+
+    def stop(self):
+        """ Close the innermost stage """
+        if not self.enabled:
+            return
+        frame = self.stack.pop()
+        peak = max(frame["traced_peak"], tracemalloc.get_traced_memory()[1])
+        if self.stack:
+            self.stack[-1]["traced_peak"] = max(self.stack[-1]["traced_peak"], peak)
+
+        frame["record"].update({"wall_s": time.perf_counter() - frame["wall"], "cpu_s": cpu_seconds() - frame["cpu"],
+                                "traced_peak_mb": peak / 1e6, "peak_rss_mb": peak_rss_mb()})
+        if not self.stack:
+            tracemalloc.stop()
+
+    def adopt(self, stages):
+        """ Record stages timed in another process, e.g. a pool worker, nested under the open stage """
+        if not self.enabled:
+            return
+        for stage in stages:
+            self.stages.append(dict(stage, depth=len(self.stack) + stage["depth"]))
+
+    def table(self):
+        """ Printable table of recorded stages, nested stages indented """
+        lines = [f'{"Stage":<36}{"Wall (s)":>10}{"CPU (s)":>10}{"Traced (MB)":>13}{"RSS (MB)":>10}']
+        for stage in self.stages:
+            name = "  " * stage["depth"] + stage["stage"]
+            lines.append(f'{name:<36}{stage["wall_s"]:>10.3f}{stage["cpu_s"]:>10.3f}'
+                         f'{stage["traced_peak_mb"]:>13.1f}{stage["peak_rss_mb"]:>10.1f}')
+        return "\n".join(lines)
+
+    def save(self, out_dir):
+        """ Write recorded stages as json into an output directory """
+        with open(os.path.join(out_dir, REPORT_FILE), "w") as report_file:
+            json.dump(self.stages, report_file, indent=4)
+
+
+# Shared profiler, so library code can mark stages without threading one through
+PROFILER = Profiler()
+
+
+def stage(name):
+    """ Stage of the shared profiler """
+    return PROFILER.stage(name)
@@ -1,667 +1,593 @@
+import argparse
 import datetime
+import functools
+import hashlib
+import inspect
 import os
 import copy
 import multiprocessing
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
+import binning
+import cache
+import disparity
+import groups
+import incremental
+import instrument
+import olap
+import rates
+import resample
+import results
+import sampling
+import stats
+import trends
 
 
 # GLOBAL VARIABLES
 TIME = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 PATH = os.path.dirname(os.path.realpath(__file__))
+JUSTIFIED = 'Homicide Justified (Law Enforcement Staff)'
+
+# Bar layout per outcome as (category, x offset, legend label)
+MANNER_BARS = [('Natural', -0.25, 'Natural'),
+               ('Homicide Justified (Law Enforcement Staff)', 0.25, 'Homicide Justified: Law Enforcement'),
+               ('Suicide', -0.2, 'Suicide'),
+               ('Accidental', 0.2, 'Accidental'),
+               ('Pending Investigation', -0.15, 'Pending Investigation'),
+               ('Homicide Willful (Other Inmate)', 0.15, 'Homicide Willful: Inmate'),
+               ('Cannot be Determined', -0.1, 'Unknown'),
+               ('Other', 0.1, 'Other'),
+               ('Homicide Willful (Law Enforcement Staff)', -0.05, 'Homicide Willful: Law Enforcement'),
+               ('Homicide Justified (Other Inmate)', 0.05, 'Homicide Justified: Inmate'),
+               ('Execution', 0.0, 'Execution')]
+CUSTODY_BARS = [('Sentenced', -0.2, 'Sentenced'),
+                ('Process of Arrest', 0.15, 'Process of Arrest'),
+                ('Booked - Awaiting Trial', -0.15, 'Booked - Awaiting Trial'),
+                ('Booked - No Charges Filed', 0.1, 'Booked - No Charges Filed'),
+                ('Awaiting Booking', -0.1, 'Awaiting Booking'),
+                ('Other', 0.05, 'Other'),
+                ('In Transit', -0.05, 'In Transit'),
+                ('Out to Court', 0.0, 'Out to Court')]
+OUTCOME_BARS = dict({"manner": MANNER_BARS, "custody": CUSTODY_BARS})
+
+
+def count_codes(codes, size):
+    """ Count of each category code, missing codes (== size) are dropped """
+    return np.bincount(codes, minlength=size + 1)[:size]
+
+
+def count_code_pairs(group_codes, outcome_codes, group_size, outcome_size):
+    """ Group x outcome count matrix from two code arrays in one bincount """
+    # Flatten code pairs into one index, rows missing either label fall in the trimmed last row/column
+    flat = group_codes.astype(np.int64) * (outcome_size + 1) + outcome_codes
+    counts = np.bincount(flat, minlength=(group_size + 1) * (outcome_size + 1))
+
+    return counts.reshape(group_size + 1, outcome_size + 1)[:group_size, :outcome_size]
+
+
+def count_code_cells(codes, sizes):
+    """ Count array over any number of code arrays in one bincount, missing codes are dropped """
+    return olap.count_cells(codes, sizes)[tuple(slice(0, size) for size in sizes)]
+
+
+def render_all(specs, processes=1, fast=False, store=None):
+    """ Render figure specs, matplotlib is only imported once something is drawn """
+    import render
+    return render.render_all(specs, processes, fast, store)
+
+
+@functools.lru_cache(maxsize=1)
+def sampler_fingerprint():
+    """ Hash of the sampling module and the DataSet sampling methods, so stored samples expire when sampling changes """
+    source = "".join(inspect.getsource(code) for code in [sampling, DataSet.reduce, DataSet.sampler, DataSet.subset])
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def reduce_stored(dataset, store, **params):
+    """ Reduced data set, only its count cube reused from the result store for the same source and parameters """
+    if store is None:
+        return dataset.reduce(**params)
+
+    key = results.result_key("reduce", sampler_fingerprint(), dataset.fingerprint, params)
+    counts = store.get_array(key)
+    if counts is not None:
+        return DataSet.from_cube(olap.CountCube(counts, dataset.cube_dims), dataset.out_dir, dataset.config)
+
+    reduced = dataset.reduce(**params)
+    store.put_array(key, reduced.count_cube.counts)
+    return reduced
 
 
 class DataSet:
     """ Class holding values for dataset """
 
-    def __init__(self, file, direct):
+    def __init__(self, file, direct, config=None, cache_dir=None, chunksize=None, state_dir=None, reservoir=None):
         """ Constructor for Dataset """
         self.data_name = f'Deaths In Custody Data Set'
         self.out_dir = direct
         self.file = file
-        self.csv = pd.read_csv(self.file)
-        self.reduced = pd.DataFrame()
-        self.x_data = pd.DataFrame()
-        self.race = None
-        self.gender = None
-        self.age = None
-        self.manner = None
-        self.custody = None
-        self.features = list()
-
+        self.config = config or binning.load_config()
+        self.cache_dir = cache_dir
+        self.chunksize = chunksize
+        self.state_dir = state_dir
+        self.reservoir = reservoir
+        self.sample = None
+        self.delta = None
+        self._csv = None
+        self._codes = dict()
+        self.vocab = {dim: pd.Index(self.config[dim]["categories"], name=dim)
+                      for dim in binning.DIMENSIONS + binning.TIME_DIMENSIONS if dim in self.config}
+        self.cube_dims = [dim for dim in olap.CUBE_DIMENSIONS if dim in self.vocab]
+        self._cube = None
+        # Set by chunked, incremental and merged data sets, which only hold the count cube, no rows
+        self.streamed = False
+        self.parent = None
+        self.rows = None
+        self._groups = None
+        self._features = None
+        self._cache_key = None
+        self._fingerprint = None
+
+    @property
+    def csv(self):
+        """ Raw csv frame, only read on first access """
+        if self._csv is None:
+            if self.parent is not None:
+                self._csv = self.parent.csv.iloc[self.rows]
+            else:
+                with instrument.stage("read_csv"):
+                    self._csv = pd.read_csv(self.file)
+        return self._csv
+
+    @csv.setter
+    def csv(self, frame):
+        """ Replace raw csv frame """
+        self._csv = frame
+
+    @property
+    def x_data(self):
+        """ Raw csv frame with classification labels dropped """
+        return self.csv.drop(columns=[self.config[dim]["column"] for dim in binning.OUTCOMES])
+
+    @property
+    def features(self):
+        """ Raw column names minus classification labels, only the csv header is read """
+        if self._features is None:
+            if self.parent is not None:
+                self._features = self.parent.features
+            elif self.file is None:
+                self._features = list()
+            else:
+                columns = self._csv.columns if self._csv is not None else pd.read_csv(self.file, nrows=0).columns
+                outcomes = [self.config[dim]["column"] for dim in binning.OUTCOMES]
+                self._features = [column for column in columns if column not in outcomes]
+        return self._features
+
+    @property
+    def fingerprint(self):
+        """ Hash of the source content and binning config, as keyed in the cache """
+        if self.parent is not None or self.file is None:
+            raise ValueError("Only data sets read from a file have a fingerprint")
+        if self._fingerprint is None:
+            self._fingerprint = self._cache_key or cache.cache_key(self.file, self.config)
+        return self._fingerprint
+
+    @property
+    def race(self):
+        """ Binned race labels """
+        return self.label_series("race")
+
+    @property
+    def gender(self):
+        """ Gender labels """
+        return self.label_series("gender")
+
+    @property
+    def age(self):
+        """ Binned age labels """
+        return self.label_series("age")
+
+    @property
+    def manner(self):
+        """ Manner of death labels """
+        return self.label_series("manner")
+
+    @property
+    def custody(self):
+        """ Custody status labels """
+        return self.label_series("custody")
+
+    @property
+    def year(self):
+        """ Year of death labels """
+        return self.label_series("year")
+
+    @property
+    def month(self):
+        """ Year and month of death labels """
+        return self.label_series("month")
+
+    @instrument.stage("process")
     def process(self):
-        """ Processes data set """
-        # Separate classification labels
-        self.x_data = self.csv.drop(["manner_of_death", "custody_status"], 1)
-        self.manner = copy.deepcopy(self.csv["manner_of_death"])
-        self.custody = copy.deepcopy(self.csv["custody_status"])
-        self.race = copy.deepcopy(self.csv["race"])
-        self.gender = copy.deepcopy(self.csv["gender"])
-        self.age = copy.deepcopy(self.csv["age"])
-        self.features = list(self.x_data.columns)
-
-        # Bin Race to combine Asian/Oceanic:
-        for index, race in self.csv["race"].items():
-            if (race == "Other Asian" or race == "Filipino" or race == "Vietnamese" or
-                    race == "Asian Indian" or race == "Pacific Islander" or race == "Korean" or
-                    race == "Chinese" or race == "Laotian" or race == "Samoan" or race == "Cambodian" or
-                    race == "Japanese" or race == "Hawaiian" or race == "Guamanian"):
-
-                # Set all these to Asian/Oceanic
-                self.race[index] = "Asian/Oceanic"
-
-        # Bin Age into relevant decades
-        for index, age in self.csv["age"].items():
-            if age == "Unk":
-                self.age[index] = "Unknown"
-            elif int(age) <= 29:
-                self.age[index] = "0-29"
-            elif int(age) <= 39:
-                self.age[index] = "30-39"
-            elif int(age) <= 49:
-                self.age[index] = "40-49"
-            elif int(age) <= 59:
-                self.age[index] = "50-59"
-            elif int(age) <= 69:
-                self.age[index] = "60-69"
+        """ Processes data set, columns are only binned when first used """
+        self._groups = None
+        self._codes = dict()
+        self._cube = None
+        if self.chunksize:
+            self.process_stream()
+            return
+        if self.state_dir:
+            self.process_incremental()
+            return
+
+        # Load whichever columns are cached for this source and config, the rest are binned on first use
+        if self.cache_dir:
+            self._cache_key = cache.cache_key(self.file, self.config)
+            entry = cache.load(self.cache_dir, self._cache_key)
+            if entry:
+                self._codes = dict(entry[1])
+                counts = cache.load_array(self.cache_dir, self._cache_key, "cube")
+                if counts is not None:
+                    self._cube = olap.CountCube(counts, self.cube_dims)
+
+    def reduce(self, frac=0.5, seed=1, method="random", by="race", target=None, weights=None):
+        """ Reduces data set by a fraction via random, stratified (proportional or Neyman) or weighted sampling """
+        if self.streamed:
+            raise ValueError("Streamed data set holds no rows to sample, stream with a reservoir instead")
+
+        # Reduce via random sample with no duplicates, same draw as DataFrame.sample
+        if method == "random":
+            count = len(self.codes(by))
+            rows = np.random.RandomState(seed).choice(count, size=round(frac * count), replace=False)
+            return self.subset(np.sort(rows))
+
+        return self.subset(self.sampler(frac, method, by, target, weights).rows(np.random.default_rng(seed)))
+
+    def sampler(self, frac=0.5, method="proportional", by="race", target=None, weights=None):
+        """ Sampler of a fraction of rows, strata or weights from one binned column, reusable for many draws """
+        codes = self.codes(by)
+        labels = self.labels(by)
+        size = round(frac * len(codes))
+        if method == "weighted":
+            category = sampling.category_weights(codes, labels, weights)
+            return sampling.Sampler(len(codes), size, weights=category[codes])
+
+        # Strata are the column's categories, rows missing it form one more stratum
+        groups = sampling.strata(codes, len(labels))
+        scores = None
+        if method == "neyman":
+            if target is None:
+                raise ValueError("Neyman allocation needs a target=(column, label) outcome")
+            col, label = target
+            scores = sampling.neyman_scores(codes, len(labels), self.codes(col) == self.labels(col).get_loc(label))
+        elif method != "proportional":
+            raise ValueError(f"Unknown sampling method {method}, one of {', '.join(sampling.METHODS)}")
+
+        return sampling.Sampler(len(codes), size, groups, sampling.allocate([len(group) for group in groups], size,
+                                                                           scores))
+
+    def subset(self, rows):
+        """ Data set view over row positions, sharing the parent's codes and vocabularies """
+        view = copy.copy(self)
+        view.parent = self
+        view.rows = rows
+        view.cache_dir = None
+        view.chunksize = None
+        view.state_dir = None
+        view._csv = None
+        view._codes = dict()
+        view._groups = None
+        view._cache_key = None
+        view._cube = None
+
+        return view
+
+    @property
+    def groups(self):
+        """ Group index of sorted row ids per category, built once on first use """
+        if self._groups is None:
+            if self.streamed:
+                raise ValueError("Streamed data set holds no rows to index")
+            self._groups = groups.GroupIndex(self, binning.DIMENSIONS)
+        return self._groups
+
+    def filter(self, **filters):
+        """ Data set view of rows matching every dim=label filter, e.g. race="Black" """
+        return self.subset(self.groups.select(**filters))
+
+    def codes(self, col):
+        """ Category codes of a binned column, len(labels) where missing """
+        # Views gather their codes from the parent through the row index on first use
+        if col not in self._codes:
+            if self.parent is not None:
+                self._codes[col] = self.parent.codes(col)[self.rows]
+            elif self.streamed:
+                raise ValueError(f"No codes for {col}, data set is streamed")
             else:
-                self.age[index] = "70+"
+                self._codes[col] = self.derive(col)
+        return self._codes[col]
+
+    def derive(self, col):
+        """ Bins one column from the csv, added to the cache entry when caching """
+        with instrument.stage(f"bin {col}"):
+            values = binning.bin_dimension(self.csv, self.config, col)
+
+        if self._cache_key:
+            cache.store_column(self.cache_dir, self._cache_key, self.cache_meta(), col, values)
+        return values
+
+    def cache_meta(self):
+        """ Cache entry meta of this data set's source and vocabularies """
+        return dict({"source": os.path.realpath(self.file),
+                     "categories": {dim: list(labels) for dim, labels in self.vocab.items()}})
+
+    @property
+    def count_cube(self):
+        """ Dense count cube over every cube dimension, binning every one of them, counted once on request """
+        if self._cube is None:
+            with instrument.stage("count_cube"):
+                counts = olap.count_cells([self.codes(dim) for dim in self.cube_dims],
+                                          [len(self.vocab[dim]) for dim in self.cube_dims])
+            if self._cache_key:
+                cache.store_column(self.cache_dir, self._cache_key, self.cache_meta(), "cube", counts)
+            self._cube = olap.CountCube(counts, self.cube_dims)
+        return self._cube
+
+    def count_all(self):
+        """ Count every cube dimension once, so later count queries are summed out of the cube, returns the cube """
+        return self.count_cube
+
+    def counted(self, dims):
+        """ Whether counts over some columns are summed out of an already counted cube """
+        # Queries never build the cube, so a single column only bins that column and views count their own rows
+        return self._cube is not None and all(dim in self.cube_dims for dim in dims)
+
+    def label_series(self, col):
+        """ Labels of a binned column as categorical, materialized from codes on each call """
+        index = self.rows if self.rows is not None else None
+        return pd.Series(binning.to_categorical(self.codes(col), self.vocab[col]), index=index,
+                         name=self.config[col]["column"])
+
+    def memory_report(self):
+        """ Bytes per binned column as object strings (previous layout) vs codes """
+        report = dict()
+        for dim in binning.DIMENSIONS:
+            codes = self.codes(dim)
+            labels = self.label_series(dim).astype(object)
+            report[dim] = dict({"object_bytes": int(labels.memory_usage(index=False, deep=True)),
+                                "code_bytes": int(codes.nbytes),
+                                "vocab_bytes": int(self.vocab[dim].memory_usage(deep=True))})
+
+        report = pd.DataFrame(report).T
+        report.loc["total"] = report.sum()
+        report["ratio"] = report["object_bytes"] / (report["code_bytes"] + report["vocab_bytes"])
+
+        return report
+
+    def init_counts(self):
+        """ Zeroed running count cube of a data set holding no rows """
+        self._cube = olap.CountCube.zeros(self.cube_dims, [len(self.vocab[dim]) for dim in self.cube_dims])
+        self.streamed = True
+
+    def bin_batch(self, frame):
+        """ Codes of every cube dimension of a batch of rows """
+        return {dim: binning.bin_dimension(frame, self.config, dim) for dim in self.cube_dims}
+
+    def process_stream(self):
+        """ Processes data set in chunks, reducing each into running counts """
+        columns = list(dict.fromkeys(self.config[dim]["column"] for dim in self.cube_dims))
+        self.init_counts()
+
+        # Only label columns are read, as strings, so chunk memory is fixed per row
+        reader = pd.read_csv(self.file, usecols=columns, dtype=dict.fromkeys(columns, str), chunksize=self.chunksize)
+        reservoir = sampling.Reservoir(self.reservoir, seed=1) if self.reservoir else None
+        for chunk in reader:
+            codes = self.bin_batch(chunk)
+            self._cube.add_codes(codes)
+            if reservoir:
+                reservoir.add(codes)
+
+        # Uniform sample of the stream, a row-mode data set over its codes
+        if reservoir:
+            self.sample = DataSet.from_codes(reservoir.codes, self.out_dir, self.config)
+
+    def process_incremental(self):
+        """ Processes only rows new since the stored state, merging their counts into it """
+        state = incremental.load_state(self.state_dir, self.config)
+        hashes = incremental.row_hashes(self.csv)
+
+        # Rows dropped or edited in the release invalidate stored counts, so recount all
+        if state and incremental.removed_rows(hashes, state["hashes"], state["hash_counts"]):
+            print(f"Incremental: stored rows missing from {self.file}, recounting all rows")
+            state = None
+
+        if state:
+            self._cube = state["cube"]
+            self.streamed = True
+            rows = incremental.new_rows(hashes, state["hashes"], state["hash_counts"])
+            sources = state["meta"]["sources"]
+        else:
+            self.init_counts()
+            rows = np.arange(len(hashes))
+            sources = list()
+
+        # Bin and count the delta only
+        self._cube.add_codes(self.bin_batch(self.csv.iloc[rows]))
+        self.delta = len(rows)
+
+        unique, multiplicity = np.unique(hashes, return_counts=True)
+        incremental.save_state(self.state_dir, self.config, self._cube, unique, multiplicity,
+                               sources + [os.path.realpath(self.file)])
+
+    @classmethod
+    def from_codes(cls, codes, direct, config=None):
+        """ Data set over already binned codes, e.g. a sample kept while streaming """
+        dataset = cls(None, direct, config)
+        dataset._codes = dict(codes)
+        return dataset
+
+    @classmethod
+    def from_cube(cls, cube, direct, config=None):
+        """ Count-only data set over an already counted cube, e.g. merged from several files """
+        dataset = cls(None, direct, config)
+        dataset._cube = cube
+        dataset.streamed = True
+        return dataset
+
+    def labels(self, col):
+        """ Category labels of a binned column """
+        return self.vocab[col]
+
+    def value_counts(self, col):
+        """ Count per category of a binned column """
+        labels = self.labels(col)
+        if self.counted([col]):
+            counts = self.count_cube.rollup(col)
+        else:
+            counts = count_codes(self.codes(col), len(labels))
+
+        return pd.Series(counts, index=pd.Index(labels, name=col))
+
+    def crosstab(self, group_col, outcome_col):
+        """ Count matrix of group vs outcome categories in one bincount pass """
+        group_labels = self.labels(group_col)
+        outcome_labels = self.labels(outcome_col)
+
+        # Summed out of the count cube once counted, else one pass over the two columns' codes
+        if self.counted([group_col, outcome_col]):
+            counts = self.count_cube.rollup(group_col, outcome_col)
+        else:
+            counts = count_code_pairs(self.codes(group_col), self.codes(outcome_col),
+                                      len(group_labels), len(outcome_labels))
+
+        return pd.DataFrame(counts, index=pd.Index(group_labels, name=group_col),
+                            columns=pd.Index(outcome_labels, name=outcome_col))
+
+    def cube(self, time_col, group_col, outcome_col):
+        """ Time x group x outcome count cube, with time x group totals also counting rows missing the outcome """
+        dims = [time_col, group_col, outcome_col]
+        return trends.Cube(self.intersection(*dims), *[self.labels(dim) for dim in dims],
+                           totals=self.intersection(time_col, group_col))
+
+    def intersection(self, *dims):
+        """ Count array over any k binned columns, a roll-up of the count cube or else one mixed radix pass """
+        if self.counted(dims):
+            return self.count_cube.rollup(*dims)
+        return count_code_cells([self.codes(dim) for dim in dims], [len(self.labels(dim)) for dim in dims])
+
+    def intersection_table(self, *dims):
+        """ K-way counts as a frame, the last column across and every other one in the row index """
+        counts = self.intersection(*dims)
+        index = pd.MultiIndex.from_product([self.labels(dim) for dim in dims[:-1]])
+        return pd.DataFrame(counts.reshape(-1, counts.shape[-1]), index=index, columns=self.labels(dims[-1]))
+
+    def multiples_spec(self, facet_col, group_col, outcome_col, file_name):
+        """ Figure spec of small multiples, one panel of group x outcome bars per facet category """
+        counts = self.intersection(facet_col, group_col, outcome_col)
+        legend = {current: label for current, _, label in OUTCOME_BARS.get(outcome_col, [])}
+
+        return dict({"kind": "multiples", "path": os.path.join(self.out_dir, file_name),
+                     "x_labels": list(self.labels(group_col)), "x_name": f"{group_col.capitalize()} Labels",
+                     "series": [legend.get(label, label) for label in self.labels(outcome_col)],
+                     "panels": [(label, counts[index].T.tolist()) for index, label in enumerate(self.labels(facet_col))],
+                     "title": f"Number of Deaths per {facet_col.capitalize()} and {group_col.capitalize()} by "
+                              f"{outcome_col.capitalize()}"})
+
+    def hist_spec(self, counts, x_labels, bars, x_name, title, file_name):
+        """ Figure spec of grouped bars for a count matrix """
+        counts = counts.loc[x_labels]
+
+        return dict({"kind": "hist", "path": os.path.join(self.out_dir, file_name), "x_labels": list(x_labels),
+                     "bars": [(label, offset, counts[current].tolist()) for current, offset, label in bars],
+                     "x_name": x_name, "title": title})
+
+    def race_hist_specs(self):
+        """ Figure specs of histograms for race variable """
+        x_labels = ['White', 'Hispanic', 'Black', 'Asian/Oceanic', 'Other', 'American Indian']
+
+        return [self.hist_spec(self.crosstab("race", "manner"), x_labels, MANNER_BARS, "Racial Labels",
+                               "Number of Deaths per Racial Label by Manner of Death", f"race_hist_manner.png"),
+                self.hist_spec(self.crosstab("race", "custody"), x_labels, CUSTODY_BARS, "Racial Labels",
+                               "Number of Deaths per Racial Label by Custody Status", f"race_hist_custody.png")]
+
+    def age_hist_specs(self):
+        """ Figure specs of histograms for age variable """
+        x_labels = ['0-29', '30-39', '40-49', '50-59', '60-69', '70+']
+
+        return [self.hist_spec(self.crosstab("age", "manner"), x_labels, MANNER_BARS, "Age Labels",
+                               "Number of Deaths per Age Group by Manner of Death", f"age_hist_manner.png"),
+                self.hist_spec(self.crosstab("age", "custody"), x_labels, CUSTODY_BARS, "Age Labels",
+                               "Number of Deaths per Age Group by Custody Status", f"age_hist_custody.png")]
 
-    def reduce(self):
-        """ Reduces data set by 50% via random sampling """
-        # Reduce via random sample with no duplicates
-        self.reduced = self.csv.sample(frac=0.5, replace=False, random_state=1)
-        reduced_copy = copy.deepcopy(self)
-        reduced_copy.csv = self.reduced
-        reduced_copy.process()
+    def gender_hist_specs(self):
+        """ Figure specs of histograms for gender variable """
+        x_labels = ['Male', 'Female']
 
-        return reduced_copy
+        return [self.hist_spec(self.crosstab("gender", "manner"), x_labels, MANNER_BARS, "Gender Labels",
+                               "Number of Deaths by Gender by Manner of Death", f"gender_hist_manner.png"),
+                self.hist_spec(self.crosstab("gender", "custody"), x_labels, CUSTODY_BARS, "Gender Labels",
+                               "Number of Deaths by Gender by Custody Status", f"gender_hist_custody.png")]
 
     def generate_race_hist(self):
         """ Generate histogram for race variable """
-        # Create dicts for histograms
-        wh_ma_dict = dict({'Natural': 0, 'Accidental': 0, 'Suicide': 0, 'Cannot be Determined': 0,
-                           'Homicide Willful (Other Inmate)': 0, 'Homicide Justified (Law Enforcement Staff)': 0,
-                           'Other': 0, 'Homicide Willful (Law Enforcement Staff)': 0, 'Execution': 0,
-                           'Pending Investigation': 0, 'Homicide Justified (Other Inmate)' : 0})
-        wh_cs_dict = dict({'Sentenced': 0, 'Process of Arrest': 0, 'Booked - Awaiting Trial': 0,
-                           'Booked - No Charges Filed': 0, 'Awaiting Booking': 0, 'Other': 0, 'In Transit': 0,
-                           'Out to Court': 0})
-        hi_ma_dict = copy.deepcopy(wh_ma_dict)
-        hi_cs_dict = copy.deepcopy(wh_cs_dict)
-        bl_ma_dict = copy.deepcopy(wh_ma_dict)
-        bl_cs_dict = copy.deepcopy(wh_cs_dict)
-        as_ma_dict = copy.deepcopy(wh_ma_dict)
-        as_cs_dict = copy.deepcopy(wh_cs_dict)
-        ot_ma_dict = copy.deepcopy(wh_ma_dict)
-        ot_cs_dict = copy.deepcopy(wh_cs_dict)
-        am_ma_dict = copy.deepcopy(wh_ma_dict)
-        am_cs_dict = copy.deepcopy(wh_cs_dict)
-
-        # Find independent results for each
-        for index, race in self.race.items():
-            if race == "White":
-                # Parse Manner of Death
-                if self.manner[index] in wh_ma_dict.keys():
-                    wh_ma_dict[self.manner[index]] += 1
-                else:
-                    wh_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in wh_cs_dict.keys():
-                    wh_cs_dict[self.custody[index]] += 1
-                else:
-                    wh_cs_dict[self.custody[index]] = 1
-
-            elif race == "Hispanic":
-                # Parse Manner of Death
-                if self.manner[index] in hi_ma_dict.keys():
-                    hi_ma_dict[self.manner[index]] += 1
-                else:
-                    hi_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in hi_cs_dict.keys():
-                    hi_cs_dict[self.custody[index]] += 1
-                else:
-                    hi_cs_dict[self.custody[index]] = 1
-
-            elif race == "Black":
-                # Parse Manner of Death
-                if self.manner[index] in bl_ma_dict.keys():
-                    bl_ma_dict[self.manner[index]] += 1
-                else:
-                    bl_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in bl_cs_dict.keys():
-                    bl_cs_dict[self.custody[index]] += 1
-                else:
-                    bl_cs_dict[self.custody[index]] = 1
-
-            elif race == "Asian/Oceanic":
-                # Parse Manner of Death
-                if self.manner[index] in as_ma_dict.keys():
-                    as_ma_dict[self.manner[index]] += 1
-                else:
-                    as_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in as_cs_dict.keys():
-                    as_cs_dict[self.custody[index]] += 1
-                else:
-                    as_cs_dict[self.custody[index]] = 1
-
-            elif race == "Other":
-                # Parse Manner of Death
-                if self.manner[index] in ot_ma_dict.keys():
-                    ot_ma_dict[self.manner[index]] += 1
-                else:
-                    ot_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in ot_cs_dict.keys():
-                    ot_cs_dict[self.custody[index]] += 1
-                else:
-                    ot_cs_dict[self.custody[index]] = 1
-
-            elif race == "American Indian":
-                # Parse Manner of Death
-                if self.manner[index] in am_ma_dict.keys():
-                    am_ma_dict[self.manner[index]] += 1
-                else:
-                    am_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in am_cs_dict.keys():
-                    am_cs_dict[self.custody[index]] += 1
-                else:
-                    am_cs_dict[self.custody[index]] = 1
-
-        # Generate the graphs
-        #print(wh_ma_dict)
-        #print(hi_ma_dict)
-        #print(bl_ma_dict)
-        #print(as_ma_dict)
-        #print(ot_ma_dict)
-        #print(am_ma_dict)
-
-        x_labels = ['White', 'Hispanic', 'Black', 'Asian/Oceanic', 'Other', 'American Indian']
-        current = 'Natural'
-        natural = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                   as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Homicide Justified (Law Enforcement Staff)'
-        homi_just = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                     as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Suicide'
-        suicide = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                   as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Accidental'
-        accident = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                    as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Pending Investigation'
-        pending = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                   as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Homicide Willful (Other Inmate)'
-        homi_will = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                     as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Cannot be Determined'
-        unknown = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                   as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Other'
-        other = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                 as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Homicide Willful (Law Enforcement Staff)'
-        homi_law = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                    as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Homicide Justified (Other Inmate)'
-        homi_inm = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                    as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-        current = 'Execution'
-        execution = [wh_ma_dict[current], hi_ma_dict[current], bl_ma_dict[current],
-                     as_ma_dict[current], ot_ma_dict[current], am_ma_dict[current]]
-
-        x_axis = np.arange(len(x_labels))
-
-        fig, ax = plt.subplots()
-
-        plt.bar(x_axis - 0.25, natural, 0.05, label='Natural')
-        plt.bar(x_axis + 0.25, homi_just, 0.05, label='Homicide Justified: Law Enforcement')
-        plt.bar(x_axis - 0.2, suicide, 0.05, label='Suicide')
-        plt.bar(x_axis + 0.2, accident, 0.05, label='Accidental')
-        plt.bar(x_axis - 0.15, pending, 0.05, label='Pending Investigation')
-        plt.bar(x_axis + 0.15, homi_will, 0.05, label='Homicide Willful: Inmate')
-        plt.bar(x_axis - 0.1, unknown, 0.05, label='Unknown')
-        plt.bar(x_axis + 0.1, other, 0.05, label='Other')
-        plt.bar(x_axis - 0.05, homi_law, 0.05, label='Homicide Willful: Law Enforcement')
-        plt.bar(x_axis + 0.05, homi_inm, 0.05, label='Homicide Justified: Inmate')
-        plt.bar(x_axis + 0.0, execution, 0.05, label='Execution')
-
-        plt.xticks(x_axis, x_labels)
-        plt.xlabel("Racial Labels")
-        plt.ylabel("Number of Deaths")
-        plt.title("Number of Deaths per Racial Label by Manner of Death")
-        ax.xaxis_date()
-        ax.autoscale(tight=True)
-        plt.legend()
-        fig.savefig(os.path.join(self.out_dir, f"race_hist_manner.png"))
-
-        # Generate the graphs
-        #print(wh_cs_dict)
-        #print(hi_cs_dict)
-        #print(bl_cs_dict)
-        #print(as_cs_dict)
-        #print(ot_cs_dict)
-        #print(am_cs_dict)
-
-        current = 'Sentenced'
-        sentenced = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                     as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-        current = 'Process of Arrest'
-        process_of = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                      as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-        current = 'Booked - Awaiting Trial'
-        booked_await = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                        as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-        current = 'Other'
-        other = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                 as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-        current = 'Booked - No Charges Filed'
-        booked_no = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                     as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-        current = 'Awaiting Booking'
-        awaiting = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                    as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-        current = 'In Transit'
-        transit = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                   as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-        current = 'Out to Court'
-        outtocourt = [wh_cs_dict[current], hi_cs_dict[current], bl_cs_dict[current],
-                      as_cs_dict[current], ot_cs_dict[current], am_cs_dict[current]]
-
-        x_axis = np.arange(len(x_labels))
-
-        fig, ax = plt.subplots()
-
-        plt.bar(x_axis - 0.2, sentenced, 0.05, label='Sentenced')
-        plt.bar(x_axis + 0.15, process_of, 0.05, label='Process of Arrest')
-        plt.bar(x_axis - 0.15, booked_await, 0.05, label='Booked - Awaiting Trial')
-        plt.bar(x_axis + 0.1, other, 0.05, label='Other')
-        plt.bar(x_axis - 0.1, booked_no, 0.05, label='Booked - No Charges Filed')
-        plt.bar(x_axis + 0.05, awaiting, 0.05, label='Awaiting Booking')
-        plt.bar(x_axis - 0.05, transit, 0.05, label='In Transit')
-        plt.bar(x_axis + 0.0, outtocourt, 0.05, label='Out to Court')
-
-        plt.xticks(x_axis, x_labels)
-        plt.xlabel("Racial Labels")
-        plt.ylabel("Number of Deaths")
-        plt.title("Number of Deaths per Racial Label by Custody Status")
-        ax.xaxis_date()
-        ax.autoscale(tight=True)
-        plt.legend()
-        fig.savefig(os.path.join(self.out_dir, f"race_hist_custody.png"))
+        render_all(self.race_hist_specs())
 
     def generate_age_hist(self):
         """ Generate histogram for age variable """
-        # Create dicts for histograms
-        zero_ma_dict = dict({'Natural': 0, 'Accidental': 0, 'Suicide': 0, 'Cannot be Determined': 0,
-                             'Homicide Willful (Other Inmate)': 0, 'Homicide Justified (Law Enforcement Staff)': 0,
-                             'Other': 0, 'Homicide Willful (Law Enforcement Staff)': 0, 'Execution': 0,
-                             'Pending Investigation': 0, 'Homicide Justified (Other Inmate)' : 0})
-        zero_cs_dict = dict({'Sentenced': 0, 'Process of Arrest': 0, 'Booked - Awaiting Trial': 0,
-                             'Booked - No Charges Filed': 0, 'Awaiting Booking': 0, 'Other': 0, 'In Transit': 0,
-                             'Out to Court': 0})
-        three_ma_dict = copy.deepcopy(zero_ma_dict)
-        three_cs_dict = copy.deepcopy(zero_cs_dict)
-        four_ma_dict = copy.deepcopy(zero_ma_dict)
-        four_cs_dict = copy.deepcopy(zero_cs_dict)
-        five_ma_dict = copy.deepcopy(zero_ma_dict)
-        five_cs_dict = copy.deepcopy(zero_cs_dict)
-        six_ma_dict = copy.deepcopy(zero_ma_dict)
-        six_cs_dict = copy.deepcopy(zero_cs_dict)
-        seven_ma_dict = copy.deepcopy(zero_ma_dict)
-        seven_cs_dict = copy.deepcopy(zero_cs_dict)
-
-        # Find independent results for each
-        for index, age in self.age.items():
-            if age == "0-29":
-                # Parse Manner of Death
-                if self.manner[index] in zero_ma_dict.keys():
-                    zero_ma_dict[self.manner[index]] += 1
-                else:
-                    zero_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in zero_cs_dict.keys():
-                    zero_cs_dict[self.custody[index]] += 1
-                else:
-                    zero_cs_dict[self.custody[index]] = 1
-
-            elif age == "30-39":
-                # Parse Manner of Death
-                if self.manner[index] in three_ma_dict.keys():
-                    three_ma_dict[self.manner[index]] += 1
-                else:
-                    three_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in three_cs_dict.keys():
-                    three_cs_dict[self.custody[index]] += 1
-                else:
-                    three_cs_dict[self.custody[index]] = 1
-
-            elif age == "40-49":
-                # Parse Manner of Death
-                if self.manner[index] in four_ma_dict.keys():
-                    four_ma_dict[self.manner[index]] += 1
-                else:
-                    four_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in four_cs_dict.keys():
-                    four_cs_dict[self.custody[index]] += 1
-                else:
-                    four_cs_dict[self.custody[index]] = 1
-
-            elif age == "50-59":
-                # Parse Manner of Death
-                if self.manner[index] in five_ma_dict.keys():
-                    five_ma_dict[self.manner[index]] += 1
-                else:
-                    five_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in five_cs_dict.keys():
-                    five_cs_dict[self.custody[index]] += 1
-                else:
-                    five_cs_dict[self.custody[index]] = 1
-
-            elif age == "60-69":
-                # Parse Manner of Death
-                if self.manner[index] in six_ma_dict.keys():
-                    six_ma_dict[self.manner[index]] += 1
-                else:
-                    six_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in six_cs_dict.keys():
-                    six_cs_dict[self.custody[index]] += 1
-                else:
-                    six_cs_dict[self.custody[index]] = 1
-
-            elif age == "70+":
-                # Parse Manner of Death
-                if self.manner[index] in seven_ma_dict.keys():
-                    seven_ma_dict[self.manner[index]] += 1
-                else:
-                    seven_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in seven_cs_dict.keys():
-                    seven_cs_dict[self.custody[index]] += 1
-                else:
-                    seven_cs_dict[self.custody[index]] = 1
-
-        # Generate the graphs
-        #print(zero_ma_dict)
-        #print(three_ma_dict)
-        #print(four_ma_dict)
-        #print(five_ma_dict)
-        #print(six_ma_dict)
-        #print(seven_ma_dict)
-
-        x_labels = ['0-29', '30-39', '40-49', '50-59', '60-69', '70+']
-        current = 'Natural'
-        natural = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                   five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Homicide Justified (Law Enforcement Staff)'
-        homi_just = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                     five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Suicide'
-        suicide = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                   five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Accidental'
-        accident = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                    five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Pending Investigation'
-        pending = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                   five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Homicide Willful (Other Inmate)'
-        homi_will = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                     five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Cannot be Determined'
-        unknown = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                   five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Other'
-        other = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                 five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Homicide Willful (Law Enforcement Staff)'
-        homi_law = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                    five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Homicide Justified (Other Inmate)'
-        homi_inm = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                    five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-        current = 'Execution'
-        execution = [zero_ma_dict[current], three_ma_dict[current], four_ma_dict[current],
-                     five_ma_dict[current], six_ma_dict[current], seven_ma_dict[current]]
-
-        x_axis = np.arange(len(x_labels))
-
-        fig, ax = plt.subplots()
-
-        plt.bar(x_axis - 0.25, natural, 0.05, label='Natural')
-        plt.bar(x_axis + 0.25, homi_just, 0.05, label='Homicide Justified: Law Enforcement')
-        plt.bar(x_axis - 0.2, suicide, 0.05, label='Suicide')
-        plt.bar(x_axis + 0.2, accident, 0.05, label='Accidental')
-        plt.bar(x_axis - 0.15, pending, 0.05, label='Pending Investigation')
-        plt.bar(x_axis + 0.15, homi_will, 0.05, label='Homicide Willful: Inmate')
-        plt.bar(x_axis - 0.1, unknown, 0.05, label='Unknown')
-        plt.bar(x_axis + 0.1, other, 0.05, label='Other')
-        plt.bar(x_axis - 0.05, homi_law, 0.05, label='Homicide Willful: Law Enforcement')
-        plt.bar(x_axis + 0.05, homi_inm, 0.05, label='Homicide Justified: Inmate')
-        plt.bar(x_axis + 0.0, execution, 0.05, label='Execution')
-
-        plt.xticks(x_axis, x_labels)
-        plt.xlabel("Age Labels")
-        plt.ylabel("Number of Deaths")
-        plt.title("Number of Deaths per Age Group by Manner of Death")
-        ax.xaxis_date()
-        ax.autoscale(tight=True)
-        plt.legend()
-        fig.savefig(os.path.join(self.out_dir, f"age_hist_manner.png"))
-
-        # Generate the graphs
-        #print("----------------------------------------------------------------------")
-        #print(zero_cs_dict)
-        #print(three_cs_dict)
-        #print(four_cs_dict)
-        #print(five_cs_dict)
-        #print(six_cs_dict)
-        #print(seven_cs_dict)
-
-        current = 'Sentenced'
-        sentenced = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                     five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-        current = 'Process of Arrest'
-        proc = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-        current = 'Booked - Awaiting Trial'
-        booked_aw = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                     five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-        current = 'Booked - No Charges Filed'
-        booked_no = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                     five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-        current = 'Awaiting Booking'
-        awaitb = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                  five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-        current = 'Other'
-        othe = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-        current = 'In Transit'
-        trans = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                 five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-        current = 'Out to Court'
-        court = [zero_cs_dict[current], three_cs_dict[current], four_cs_dict[current],
-                 five_cs_dict[current], six_cs_dict[current], seven_cs_dict[current]]
-
-        x_axis = np.arange(len(x_labels))
-
-        fig, ax = plt.subplots()
-
-        plt.bar(x_axis - 0.2, sentenced, 0.05, label='Sentenced')
-        plt.bar(x_axis + 0.15, proc, 0.05, label='Process of Arrest')
-        plt.bar(x_axis - 0.15, booked_aw, 0.05, label='Booked - Awaiting Trial')
-        plt.bar(x_axis + 0.1, booked_no, 0.05, label='Booked - No Charges Filed')
-        plt.bar(x_axis - 0.1, awaitb, 0.05, label='Awaiting Booking')
-        plt.bar(x_axis + 0.05, othe, 0.05, label='Other')
-        plt.bar(x_axis - 0.05, trans, 0.05, label='In Transit')
-        plt.bar(x_axis + 0.0, court, 0.05, label='Out to Court')
-
-        plt.xticks(x_axis, x_labels)
-        plt.xlabel("Age Labels")
-        plt.ylabel("Number of Deaths")
-        plt.title("Number of Deaths per Age Group by Custody Status")
-        ax.xaxis_date()
-        ax.autoscale(tight=True)
-        plt.legend()
-        fig.savefig(os.path.join(self.out_dir, f"age_hist_custody.png"))
+        render_all(self.age_hist_specs())
 
     def generate_gender_hist(self):
-        """ Generate histogram for age variable """
-        # Create dicts for histograms
-        f_ma_dict = dict({'Natural': 0, 'Accidental': 0, 'Suicide': 0, 'Cannot be Determined': 0,
-                          'Homicide Willful (Other Inmate)': 0, 'Homicide Justified (Law Enforcement Staff)': 0,
-                          'Other': 0, 'Homicide Willful (Law Enforcement Staff)': 0, 'Execution': 0,
-                          'Pending Investigation': 0, 'Homicide Justified (Other Inmate)' : 0})
-        f_cs_dict = dict({'Sentenced': 0, 'Process of Arrest': 0, 'Booked - Awaiting Trial': 0,
-                          'Booked - No Charges Filed': 0, 'Awaiting Booking': 0, 'Other': 0, 'In Transit': 0,
-                          'Out to Court': 0})
-        m_ma_dict = copy.deepcopy(f_ma_dict)
-        m_cs_dict = copy.deepcopy(f_cs_dict)
-
-        # Find independent results for each
-        for index, gender in self.gender.items():
-            if gender == "Male":
-                # Parse Manner of Death
-                if self.manner[index] in m_ma_dict.keys():
-                    m_ma_dict[self.manner[index]] += 1
-                else:
-                    m_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in m_cs_dict.keys():
-                    m_cs_dict[self.custody[index]] += 1
-                else:
-                    m_cs_dict[self.custody[index]] = 1
-
-            elif gender == "Female":
-                # Parse Manner of Death
-                if self.manner[index] in f_ma_dict.keys():
-                    f_ma_dict[self.manner[index]] += 1
-                else:
-                    f_ma_dict[self.manner[index]] = 1
-                # Parse Custody Status
-                if self.custody[index] in f_cs_dict.keys():
-                    f_cs_dict[self.custody[index]] += 1
-                else:
-                    f_cs_dict[self.custody[index]] = 1
-
-        # Generate the graphs
-        #print(m_ma_dict)
-        #print(f_ma_dict)
+        """ Generate histogram for gender variable """
+        render_all(self.gender_hist_specs())
 
-        x_labels = ['Male', 'Female']
-        current = 'Natural'
-        natural = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Homicide Justified (Law Enforcement Staff)'
-        homi_just = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Suicide'
-        suicide = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Accidental'
-        accident = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Pending Investigation'
-        pending = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Homicide Willful (Other Inmate)'
-        homi_will = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Cannot be Determined'
-        unknown = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Other'
-        other = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Homicide Willful (Law Enforcement Staff)'
-        homi_law = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Homicide Justified (Other Inmate)'
-        homi_inm = [m_ma_dict[current], f_ma_dict[current]]
-        current = 'Execution'
-        execution = [m_ma_dict[current], f_ma_dict[current]]
-
-        x_axis = np.arange(len(x_labels))
-
-        fig, ax = plt.subplots()
-
-        plt.bar(x_axis - 0.25, natural, 0.05, label='Natural')
-        plt.bar(x_axis + 0.25, homi_just, 0.05, label='Homicide Justified: Law Enforcement')
-        plt.bar(x_axis - 0.2, suicide, 0.05, label='Suicide')
-        plt.bar(x_axis + 0.2, accident, 0.05, label='Accidental')
-        plt.bar(x_axis - 0.15, pending, 0.05, label='Pending Investigation')
-        plt.bar(x_axis + 0.15, homi_will, 0.05, label='Homicide Willful: Inmate')
-        plt.bar(x_axis - 0.1, unknown, 0.05, label='Unknown')
-        plt.bar(x_axis + 0.1, other, 0.05, label='Other')
-        plt.bar(x_axis - 0.05, homi_law, 0.05, label='Homicide Willful: Law Enforcement')
-        plt.bar(x_axis + 0.05, homi_inm, 0.05, label='Homicide Justified: Inmate')
-        plt.bar(x_axis + 0.0, execution, 0.05, label='Execution')
-
-        plt.xticks(x_axis, x_labels)
-        plt.xlabel("Gender Labels")
-        plt.ylabel("Number of Deaths")
-        plt.title("Number of Deaths by Gender by Manner of Death")
-        ax.xaxis_date()
-        ax.autoscale(tight=True)
-        plt.legend()
-        fig.savefig(os.path.join(self.out_dir, f"gender_hist_manner.png"))
-
-        # Generate the graphs
-        #print("----------------------------------------------------------------------")
-        #print(m_cs_dict)
-        #print(f_cs_dict)
-
-        current = 'Sentenced'
-        sentenced = [m_cs_dict[current], f_cs_dict[current]]
-        current = 'Process of Arrest'
-        proc = [m_cs_dict[current], f_cs_dict[current]]
-        current = 'Booked - Awaiting Trial'
-        booked_aw = [m_cs_dict[current], f_cs_dict[current]]
-        current = 'Booked - No Charges Filed'
-        booked_no = [m_cs_dict[current], f_cs_dict[current]]
-        current = 'Awaiting Booking'
-        awaitb = [m_cs_dict[current], f_cs_dict[current]]
-        current = 'Other'
-        othe = [m_cs_dict[current], f_cs_dict[current]]
-        current = 'In Transit'
-        trans = [m_cs_dict[current], f_cs_dict[current]]
-        current = 'Out to Court'
-        court = [m_cs_dict[current], f_cs_dict[current]]
-
-        x_axis = np.arange(len(x_labels))
-
-        fig, ax = plt.subplots()
-
-        plt.bar(x_axis - 0.2, sentenced, 0.05, label='Sentenced')
-        plt.bar(x_axis + 0.15, proc, 0.05, label='Process of Arrest')
-        plt.bar(x_axis - 0.15, booked_aw, 0.05, label='Booked - Awaiting Trial')
-        plt.bar(x_axis + 0.1, booked_no, 0.05, label='Booked - No Charges Filed')
-        plt.bar(x_axis - 0.1, awaitb, 0.05, label='Awaiting Booking')
-        plt.bar(x_axis + 0.05, othe, 0.05, label='Other')
-        plt.bar(x_axis - 0.05, trans, 0.05, label='In Transit')
-        plt.bar(x_axis + 0.0, court, 0.05, label='Out to Court')
-
-        plt.xticks(x_axis, x_labels)
-        plt.xlabel("Gender Labels")
-        plt.ylabel("Number of Deaths")
-        plt.title("Number of Deaths by Gender by Custody Status")
-        ax.xaxis_date()
-        ax.autoscale(tight=True)
-        plt.legend()
-        fig.savefig(os.path.join(self.out_dir, f"gender_hist_custody.png"))
-
-
-def main():
+
+def main(argv=None):
     """ Main """
+    parser = argparse.ArgumentParser(description="Deaths In Custody statistics")
+    parser.add_argument("--no-cache", action="store_true", help="re-parse and re-bin the csv, ignoring the cache")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="stream the csv in chunks of this many rows, keeping only running counts")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only bin and count rows new since the last incremental run, merging stored counts")
+    parser.add_argument("--sampling", choices=sampling.METHODS, default="random",
+                        help="reduce by random, race stratified (proportional or Neyman on justified deaths) "
+                             "or inverse race frequency weighted sampling")
+    parser.add_argument("--reservoir", type=int, default=None,
+                        help="with --chunksize, keep a uniform sample of this many rows for the reduced statistics")
+    parser.add_argument("--replicates", type=int, default=0,
+                        help="resample this many 50%% subsamples for confidence intervals")
+    parser.add_argument("--permutations", type=int, default=0,
+                        help="shuffle outcome codes this many times for permutation p values of the independence tests")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print bytes of the binned columns as object strings vs category codes")
+    parser.add_argument("--fast-render", action="store_true",
+                        help="write figures with low png compression, faster for larger files")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"record time and memory per stage into profile.json, also on with {instrument.ENV_VAR}=1")
+    args = parser.parse_args(argv)
+    if args.profile:
+        instrument.PROFILER.enabled = True
+
     # Process directories
     dir_name = os.path.join(os.path.join(PATH, "out"), "DeathInCustody")
     out_dir = os.path.join(dir_name, TIME)
     os.makedirs(out_dir)
 
     # Initialize data class
-    dataset = DataSet(os.path.join(os.path.join(PATH, "data"), "DeathInCustody_2005-2020_20210603.csv"), out_dir)
+    cache_dir = None if args.no_cache else os.path.join(PATH, "cache")
+    dataset = DataSet(os.path.join(os.path.join(PATH, "data"), "DeathInCustody_2005-2020_20210603.csv"), out_dir,
+                      cache_dir=cache_dir, chunksize=args.chunksize,
+                      state_dir=os.path.join(PATH, "state") if args.incremental else None, reservoir=args.reservoir)
     dataset.process()
+    # Computed counts and rendered figures of earlier runs, reused when their inputs are unchanged
+    store = results.ResultStore(os.path.join(cache_dir, "results")) if cache_dir else None
+    if dataset.delta is not None:
+        print(f"Incremental: {dataset.delta} new rows counted")
+    # Every dimension is plotted below, so count them all once and sum each query out of the cube
+    dataset.count_all()
+
+    if args.memory_report and not dataset.streamed:
+        print(dataset.memory_report())
 
     # Core count for multi-proc
     core_count = round(multiprocessing.cpu_count() * .75)
@@ -671,91 +597,104 @@ def main():
     #print(custody_counts)
     #manner_counts = dataset.manner.value_counts()
     # Independent counts
-    race_counts = dataset.race.value_counts()
     #age_counts = dataset.age.value_counts()
     #gender_counts = dataset.gender.value_counts()
     #print(gender_counts)
 
-    # Step 3: Histograms
+    # Step 3: Histograms, only counted here and rendered together at the end
+    figures = list()
     # Generate Race Histograms
-    #dataset.generate_race_hist()
+    #with instrument.stage("race_hist"):
+    #    figures += dataset.race_hist_specs()
     # Generate Age Histograms
-    dataset.generate_age_hist()
+    with instrument.stage("age_hist"):
+        figures += dataset.age_hist_specs()
     # Generate Gender Histograms
-    dataset.generate_gender_hist()
+    with instrument.stage("gender_hist"):
+        figures += dataset.gender_hist_specs()
+
+    # Intersections of two demographics with an outcome, all summed out of the one count cube
+    with instrument.stage("intersections"):
+        figures.append(dataset.multiples_spec("race", "gender", "manner", "race_gender_manner_multiples.png"))
+        figures.append(dataset.multiples_spec("age", "race", "custody", "age_race_custody_multiples.png"))
 
     # Step 4: Two Stories, one variable
+    with instrument.stage("stats"):
+        justified = stats.describe(dataset, "race", "manner", JUSTIFIED)
     x_labels = ['White', 'Black', 'Asian/Oceanic', 'Other', 'American Indian']
-    x_data = [475, 312, 78, 21, 9]
-    fig, ax = plt.subplots()
-    ax.bar(x_labels, x_data)
-    plt.xlabel("Racial Group of Prisoner")
-    plt.ylabel("Number of Deaths")
-    plt.title("Number of Justified Deaths by Law Enforcement")
-    ax.autoscale(tight=True)
-    fig.savefig(os.path.join(out_dir, f"stats_fair_graph.png"))
+    x_data = justified["counts"][x_labels].tolist()
+    figures.append(dict({"kind": "bar", "path": os.path.join(out_dir, f"stats_fair_graph.png"), "x_labels": x_labels,
+                         "values": x_data, "x_name": "Racial Group of Prisoner", "y_name": "Number of Deaths",
+                         "title": "Number of Justified Deaths by Law Enforcement"}))
 
     x_labels = ['White', 'Hispanic', 'Black', 'Asian/Oceanic', 'Other', 'American Indian']
-    white = 475/(race_counts['White'])
-    hispa = 745/(race_counts['Hispanic'])
-    black = 312/(race_counts['Black'])
-    asian = 78/(race_counts['Asian/Oceanic'])
-    other = 21/(race_counts['Other'])
-    indian = 9/(race_counts['American Indian'])
-
-    x_data = [white, hispa, black, asian, other, indian]
-    fig, ax = plt.subplots()
-    ax.bar(x_labels, x_data)
-    plt.xlabel("Racial Group of Prisoner")
-    plt.ylabel("Ratio of Total Deaths")
-    plt.title("Ratio of Justified Deaths by Law Enforcement vs Total Deaths")
-    ax.autoscale(tight=True)
-    fig.savefig(os.path.join(out_dir, f"stats_real_graph.png"))
-
-    # Step 5: Calculate Mean
-    # Mean requires some fudging, so reverse severity
-    x_data = [475, 745, 312, 78, 21, 9]
-    total = x_data[0] + x_data[1] * 2 + x_data[2] * 3 + x_data[3] * 4 + x_data[4] * 5 + x_data[5] * 6
-    count = x_data[0] + x_data[1] + x_data[2] + x_data[3] + x_data[4] + x_data[5]
-
-    mean = total/count
-
-    # Median is simpler
-    sorted_race = dataset.race.sort_values()
-    median = sorted_race[count/2]
-
-    # Mode is easy by the count above
-    mode = "Hispanic"
-
+    with instrument.stage("rates"):
+        race_rates = rates.rates(dataset, "race", "manner").summary(JUSTIFIED).loc[x_labels]
+    figures.append(dict({"kind": "bar", "path": os.path.join(out_dir, f"stats_real_graph.png"), "x_labels": x_labels,
+                         "values": race_rates["rate"].tolist(), "lower": race_rates["lower"].tolist(),
+                         "upper": race_rates["upper"].tolist(), "x_name": "Racial Group of Prisoner",
+                         "y_name": "Ratio of Total Deaths",
+                         "title": "Ratio of Justified Deaths by Law Enforcement vs Total Deaths"}))
+
+    # Trend of the justified rate per race, over trailing 3 year windows of the year cube
+    with instrument.stage("trends"):
+        trend = dataset.cube("year", "race", "manner").rolling(3).rates(JUSTIFIED)[x_labels]
+    figures.append(dict({"kind": "line", "path": os.path.join(out_dir, f"race_trend_justified.png"),
+                         "x_labels": list(trend.index), "series": [(race, trend[race].tolist()) for race in x_labels],
+                         "x_name": "Year of Death (trailing 3 years)", "y_name": "Ratio of Total Deaths",
+                         "title": "Ratio of Justified Deaths by Law Enforcement over Time"}))
+
+    # Step 5: Mean ranks races in label order, median and mode read off the same counts
     print("Step 5:")
-    print(f'Mean: {mean}')
-    print(f'Median: {median}')
-    print(f'Mode: {mode}')
-
-    # Create Reduced data set and recalculate
-    reduced_dataset = dataset.reduce()
-    reduced_counts = reduced_dataset.race.value_counts()
-    reduced_dataset.generate_race_hist()
-
-    x_data = [234, 380, 175, 39, 8, 5]
-
-    # Mean
-    total = x_data[0] + x_data[1] * 2 + x_data[2] * 3 + x_data[3] * 4 + x_data[4] * 5 + x_data[5] * 6
-    count = x_data[0] + x_data[1] + x_data[2] + x_data[3] + x_data[4] + x_data[5]
-    mean = total/count
-
-    # Median
-    sorted_race = dataset.race.sort_values()
-    median = sorted_race[int(count/2)]
-
-    # Mode is easy by the count above
-    mode = "Hispanic"
-
-    print("Step 5: Reduced")
-    print(f'Mean: {mean}')
-    print(f'Median: {median}')
-    print(f'Mode: {mode}')
-
+    print(f'Mean: {justified["mean"]}')
+    print(f'Median: {justified["median"]}')
+    print(f'Mode: {justified["mode"]}')
+
+    # Stability of the race counts over repeated 50% subsamples, drawn from counts so streams work too
+    if args.replicates:
+        with instrument.stage("resample"):
+            replicates = resample.resample(dataset, "race", "manner", args.replicates, frac=0.5, replace=False,
+                                           seed=1, processes=core_count)
+        print("Step 5: Resampled")
+        print(replicates.summary(JUSTIFIED))
+
+    # Sampling rows needs them in memory, streamed sets only keep counts and an optional reservoir sample
+    if dataset.streamed and dataset.sample is None:
+        print("Step 5: Reduced skipped, streamed data set holds no rows to sample")
+    else:
+        # Create Reduced data set and recalculate
+        with instrument.stage("reduce"):
+            if dataset.streamed:
+                reduced_dataset = dataset.sample
+            else:
+                reduced_dataset = reduce_stored(dataset, store, frac=0.5, seed=1, method=args.sampling,
+                                                target=("manner", JUSTIFIED))
+            figures += reduced_dataset.race_hist_specs()
+
+            # Same statistics over the reduced set's own codes
+            reduced_justified = stats.describe(reduced_dataset, "race", "manner", JUSTIFIED)
+
+        print("Step 5: Reduced")
+        print(f'Mean: {reduced_justified["mean"]}')
+        print(f'Median: {reduced_justified["median"]}')
+        print(f'Mode: {reduced_justified["mode"]}')
+
+    # Step 6: Independence of every group and outcome, tested over the full data set's counts
+    with instrument.stage("disparity"):
+        tests = disparity.battery(dataset, permutations=args.permutations, seed=1, processes=core_count)
+    tests.summary.to_csv(os.path.join(out_dir, "independence_tests.csv"))
+    print("Step 6: Independence tests")
+    print(tests.summary)
+
+    # Render every figure across the pool
+    with instrument.stage("render"):
+        render_all(figures, core_count, args.fast_render, store)
+    if store is not None:
+        print(f"Results: {store.hits} reused, {store.misses} computed")
+
+    if instrument.PROFILER.enabled:
+        instrument.PROFILER.save(out_dir)
+        print(instrument.PROFILER.table())
 
 
 if __name__ == "__main__":
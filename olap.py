@@ -0,0 +1,75 @@
+import json
+import os
+import numpy as np
+import binning
+import cache
+
+
+# GLOBAL VARIABLES
+CUBE_DIMENSIONS = binning.DIMENSIONS + ["year"]
+CUBE_FILE = "cube.npz"
+
+
+def count_cells(codes, sizes):
+    """ Count array over code arrays in one mixed radix bincount, each axis keeps a last slot for missing codes """
+    flat = np.zeros(len(codes[0]), dtype=np.int64)
+    for values, size in zip(codes, sizes):
+        flat = flat * (size + 1) + values
+    shape = [size + 1 for size in sizes]
+
+    return np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+
+class CountCube:
+    """ Class holding a dense count per combination of categories, rows missing a label in that axis' last slot """
+
+    def __init__(self, counts, dims):
+        """ Constructor for CountCube """
+        self.counts = counts
+        self.dims = list(dims)
+        self._rollups = dict()
+
+    @classmethod
+    def zeros(cls, dims, sizes):
+        """ Empty cube over dims with sizes categories each """
+        return cls(np.zeros([size + 1 for size in sizes], dtype=np.int64), dims)
+
+    @property
+    def sizes(self):
+        """ Category count per dimension, without the missing slot """
+        return [size - 1 for size in self.counts.shape]
+
+    def add(self, counts):
+        """ Add counts of the same shape, e.g. from a chunk or another file """
+        self.counts += counts
+        self._rollups = dict()
+        return self
+
+    def add_codes(self, codes):
+        """ Count a batch of binned codes, a dict per dimension, into the cube """
+        return self.add(count_cells([codes[dim] for dim in self.dims], self.sizes))
+
+    def rollup(self, *dims):
+        """ Counts over dims in the given order, other axes summed out and missing slots dropped """
+        if dims not in self._rollups:
+            axes = [self.dims.index(dim) for dim in dims]
+            summed = self.counts.sum(axis=tuple(axis for axis in range(len(self.dims)) if axis not in axes))
+
+            # Summed array keeps the cube's axis order, reorder it to the requested one
+            kept = sorted(axes)
+            summed = summed.transpose([kept.index(axis) for axis in axes])
+            self._rollups[dims] = summed[tuple(slice(0, -1) for _ in dims)]
+        return self._rollups[dims]
+
+    def save(self, file):
+        """ Write counts and dimension names to an npz file """
+        with cache.swap_in(file, ".npz") as temp_file:
+            np.savez(temp_file, counts=self.counts, dims=json.dumps(self.dims))
+
+    @classmethod
+    def load(cls, file):
+        """ Cube from an npz file written by save, None when missing """
+        if not os.path.isfile(file):
+            return None
+        with np.load(file) as stored:
+            return cls(stored["counts"], json.loads(str(stored["dims"])))
@@ -0,0 +1,79 @@
+import statistics
+import numpy as np
+import pandas as pd
+
+
+def z_score(level=0.95):
+    """ Two sided standard normal quantile of a confidence level """
+    return statistics.NormalDist().inv_cdf(1 - (1 - level) / 2)
+
+
+def wilson(events, totals, level=0.95):
+    """ Wilson score interval of proportions events / totals, elementwise """
+    z = z_score(level)
+    events = np.asarray(events, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = events / totals
+        scale = 1 + z ** 2 / totals
+        center = (rate + z ** 2 / (2 * totals)) / scale
+        half = z / scale * np.sqrt(rate * (1 - rate) / totals + z ** 2 / (4 * totals ** 2))
+
+    return center - half, center + half
+
+
+def poisson(events, totals, level=0.95):
+    """ Byar's approximation of the exact Poisson interval of rates events / totals, elementwise """
+    z = z_score(level)
+    events = np.asarray(events, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lower = events * (1 - 1 / (9 * events) - z / (3 * np.sqrt(events))) ** 3
+        upper = (events + 1) * (1 - 1 / (9 * (events + 1)) + z / (3 * np.sqrt(events + 1))) ** 3
+
+    # No events bounds the rate below at exactly 0
+    lower = np.where(events > 0, lower, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return lower / totals, upper / totals
+
+
+INTERVALS = {"wilson": wilson, "poisson": poisson}
+
+
+class Rates:
+    """ Class holding rates of every outcome within every group, with confidence intervals """
+
+    def __init__(self, counts, totals, method="wilson", level=0.95):
+        """ Constructor for Rates, counts is a group x outcome frame and totals a count per group """
+        self.counts = counts
+        self.totals = totals
+        self.method = method
+        self.level = level
+
+        # Every group x outcome cell at once, totals broadcast along the outcomes
+        matrix = counts.to_numpy()
+        denominator = totals.to_numpy()[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.rate = pd.DataFrame(matrix / denominator, index=counts.index, columns=counts.columns)
+        lower, upper = INTERVALS[method](matrix, denominator, level)
+        self.lower = pd.DataFrame(lower, index=counts.index, columns=counts.columns)
+        self.upper = pd.DataFrame(upper, index=counts.index, columns=counts.columns)
+
+    def summary(self, outcome):
+        """ Count, group total, rate and interval of one outcome per group """
+        return pd.DataFrame({"count": self.counts[outcome], "total": self.totals, "rate": self.rate[outcome],
+                             "lower": self.lower[outcome], "upper": self.upper[outcome]})
+
+    def long(self):
+        """ One row per group and outcome, e.g. for export """
+        frames = {"count": self.counts, "rate": self.rate, "lower": self.lower, "upper": self.upper}
+        table = pd.concat({name: frame.stack() for name, frame in frames.items()}, axis=1)
+        table["total"] = self.totals.reindex(table.index.get_level_values(0)).to_numpy()
+
+        return table
+
+
+def rates(dataset, group_col, outcome_col, method="wilson", level=0.95):
+    """ Rates of every outcome within every group from one crosstab, over all rows of each group """
+    # Rows missing the outcome still count towards their group's total
+    return Rates(dataset.crosstab(group_col, outcome_col), dataset.value_counts(group_col), method, level)
@@ -0,0 +1,251 @@
+import functools
+import hashlib
+import io
+import math
+import multiprocessing
+import os
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+import numpy as np
+import instrument
+import results
+
+
+# GLOBAL VARIABLES
+BAR_WIDTH = 0.05
+COLORS = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+# Low zlib compression, several times faster to encode for slightly larger pngs
+FAST_PNG = dict({"compress_level": 1})
+# Figure and axes per chart kind, built once per process and redrawn for every chart
+TEMPLATES = dict()
+
+
+def template(kind):
+    """ Cached figure and axes of a chart kind, outside pyplot so nothing is registered globally """
+    if kind not in TEMPLATES:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        if kind == "hist":
+            ax.xaxis_date()
+        if kind == "line":
+            ax.tick_params(axis="x", labelrotation=45)
+            fig.set_layout_engine("tight")
+        TEMPLATES[kind] = dict({"fig": fig, "ax": ax, "artists": list()})
+    return TEMPLATES[kind]
+
+
+def grid_template(rows, columns):
+    """ Cached figure of a rows x columns grid of axes sharing their y axis, for small multiples """
+    kind = f"multiples_{rows}x{columns}"
+    if kind not in TEMPLATES:
+        fig = Figure(figsize=(3.5 * columns + 2.5, 2.8 * rows + 1), layout="constrained")
+        FigureCanvasAgg(fig)
+        axes = list(fig.subplots(rows, columns, squeeze=False, sharey=True).ravel())
+        TEMPLATES[kind] = dict({"fig": fig, "ax": axes[0], "axes": axes, "artists": list()})
+    return TEMPLATES[kind]
+
+
+def reset(chart):
+    """ Remove the previous chart's bars and legend from a template """
+    for artist in chart["artists"]:
+        artist.remove()
+    chart["artists"] = list()
+
+
+def release():
+    """ Drop every cached template and free its figure """
+    for chart in TEMPLATES.values():
+        chart["fig"].clear()
+    TEMPLATES.clear()
+
+
+def bars(ax, positions, heights, width, colors):
+    """ Every bar as one polygon collection, limits set tight around them without per patch bookkeeping """
+    # Undefined values, e.g. rates of empty groups, draw as empty bars
+    heights = np.nan_to_num(heights)
+    left = positions - width / 2
+    right = positions + width / 2
+    corners = np.stack([np.stack([left, np.zeros_like(heights)], -1), np.stack([left, heights], -1),
+                        np.stack([right, heights], -1), np.stack([right, np.zeros_like(heights)], -1)], 1)
+    collection = PolyCollection(corners, facecolors=colors, linewidths=0)
+    ax.add_collection(collection, autolim=False)
+
+    # Same limits as a tight autoscale over bars, which always include the zero baseline
+    ax.set_xlim(left.min(), right.max())
+    ax.set_ylim(min(heights.min(), 0), max(heights.max(), 0) or 1)
+    return collection
+
+
+def draw(chart, x_axis, spec, y_name):
+    """ Shared axes text of a filled template """
+    ax = chart["ax"]
+    ax.set_xticks(x_axis, spec["x_labels"])
+    ax.set_xlabel(spec["x_name"])
+    ax.set_ylabel(y_name)
+    ax.set_title(spec["title"])
+
+
+def save(chart, path, fast=False):
+    """ Write a template to png, with cheap compression on the fast path """
+    chart["fig"].savefig(path, pil_kwargs=FAST_PNG if fast else None)
+
+
+def render_hist(spec, fast=False):
+    """ Render grouped bars, every series drawn as one collection """
+    chart = template("hist")
+    reset(chart)
+    ax = chart["ax"]
+    x_axis = np.arange(len(spec["x_labels"]))
+
+    # Series x categories positions and heights, flattened into a single collection
+    labels, offsets, values = zip(*spec["bars"])
+    positions = x_axis[None, :] + np.asarray(offsets)[:, None]
+    colors = [COLORS[index % len(COLORS)] for index in range(len(labels))]
+    collection = bars(ax, positions.ravel(), np.asarray(values, dtype=float).ravel(), BAR_WIDTH,
+                      [color for color in colors for _ in x_axis])
+
+    # Legend from one proxy patch per series, as the collection itself is unlabeled
+    legend = ax.legend(handles=[Patch(color=color, label=label) for label, color in zip(labels, colors)])
+    chart["artists"] = [collection, legend]
+
+    draw(chart, x_axis, spec, "Number of Deaths")
+    save(chart, spec["path"], fast)
+
+
+def render_bar(spec, fast=False):
+    """ Render a single bar series """
+    chart = template("bar")
+    reset(chart)
+    x_axis = np.arange(len(spec["x_labels"]))
+    chart["artists"] = [bars(chart["ax"], x_axis, np.asarray(spec["values"], dtype=float), 0.8, COLORS[0])]
+
+    # Optional confidence intervals as one line collection over the bars
+    if "lower" in spec:
+        upper = np.asarray(spec["upper"], dtype=float)
+        chart["artists"].append(chart["ax"].vlines(x_axis, spec["lower"], upper, color="black"))
+        if np.isfinite(upper).any():
+            chart["ax"].set_ylim(top=max(chart["ax"].get_ylim()[1], np.nanmax(upper)))
+
+    draw(chart, x_axis, spec, spec["y_name"])
+    save(chart, spec["path"], fast)
+
+
+def render_line(spec, fast=False):
+    """ Render one line per series over ordered x labels, e.g. periods of a trend """
+    chart = template("line")
+    reset(chart)
+    ax = chart["ax"]
+    x_axis = np.arange(len(spec["x_labels"]))
+    chart["artists"] = [ax.plot(x_axis, values, label=label, color=COLORS[index % len(COLORS)])[0]
+                        for index, (label, values) in enumerate(spec["series"])]
+    chart["artists"].append(ax.legend())
+
+    draw(chart, x_axis, spec, spec["y_name"])
+    ax.relim()
+    ax.autoscale()
+    save(chart, spec["path"], fast)
+
+
+def render_multiples(spec, fast=False):
+    """ Render small multiples, one panel of grouped bars per facet, on one shared count scale """
+    panels = spec["panels"]
+    columns = min(spec.get("columns", 3), len(panels))
+    chart = grid_template(math.ceil(len(panels) / columns), columns)
+    reset(chart)
+    fig = chart["fig"]
+
+    # Series side by side inside each x category, every panel's bars one collection
+    x_axis = np.arange(len(spec["x_labels"]))
+    width = 0.8 / len(spec["series"])
+    offsets = (np.arange(len(spec["series"])) - (len(spec["series"]) - 1) / 2) * width
+    colors = [COLORS[index % len(COLORS)] for index in range(len(spec["series"]))]
+    positions = (x_axis[None, :] + offsets[:, None]).ravel()
+    top = 0
+    for ax, (title, values) in zip(chart["axes"], panels):
+        heights = np.asarray(values, dtype=float).ravel()
+        chart["artists"].append(bars(ax, positions, heights, width, [color for color in colors for _ in x_axis]))
+        ax.set_visible(True)
+        ax.set_title(title)
+        ax.set_xticks(x_axis, spec["x_labels"])
+        ax.tick_params(axis="x", labelrotation=30 if len(spec["x_labels"]) > 3 else 0)
+        top = max(top, np.nanmax(heights, initial=0))
+    for ax in chart["axes"][len(panels):]:
+        ax.set_visible(False)
+    chart["ax"].set_ylim(0, 1.05 * top or 1)
+
+    chart["artists"].append(fig.legend(handles=[Patch(color=color, label=label)
+                                                for label, color in zip(spec["series"], colors)],
+                                       loc="outside right upper"))
+    fig.suptitle(spec["title"])
+    fig.supxlabel(spec["x_name"])
+    fig.supylabel("Number of Deaths")
+    save(chart, spec["path"], fast)
+
+
+RENDERERS = {"hist": render_hist, "bar": render_bar, "line": render_line, "multiples": render_multiples}
+
+
+def render(spec, fast=False):
+    """ Render a figure spec and return its path """
+    with instrument.stage(f'savefig {os.path.basename(spec["path"])}'):
+        RENDERERS[spec["kind"]](spec, fast)
+    return spec["path"]
+
+
+def render_worker(args):
+    """ Render a figure spec in a pool worker, returning its path and the stages profiled there """
+    spec, fast, profile = args
+    # The worker's copy of the shared profiler is never saved, so its stages are timed fresh and sent back
+    instrument.PROFILER = instrument.Profiler(profile)
+    return render(spec, fast), instrument.PROFILER.stages
+
+
+def render_png(spec, fast=False):
+    """ Render a figure spec to png bytes, e.g. to serve it, without touching disk """
+    buffer = io.BytesIO()
+    with instrument.stage(f'render {spec["kind"]}'):
+        RENDERERS[spec["kind"]](dict(spec, path=buffer), fast)
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=1)
+def renderer_fingerprint():
+    """ Hash of this module and the matplotlib version, so stored figures expire when drawing changes """
+    with open(__file__, "rb") as source:
+        return f"{hashlib.sha256(source.read()).hexdigest()[:16]}_{matplotlib.__version__}"
+
+
+def figure_key(spec, fast=False):
+    """ Content address of a figure, everything in its spec except where it is written """
+    return results.result_key("figure", renderer_fingerprint(), fast,
+                              {name: value for name, value in spec.items() if name != "path"})
+
+
+def render_all(specs, processes=1, fast=False, store=None):
+    """ Render figure specs, fanned out over a process pool when processes > 1, stored ones linked instead """
+    if store is not None:
+        keys = [figure_key(spec, fast) for spec in specs]
+        missing = [(key, spec) for key, spec in zip(keys, specs) if not store.fetch(key, ".png", spec["path"])]
+        render_all([spec for _, spec in missing], processes, fast)
+        for key, spec in missing:
+            store.put(key, ".png", spec["path"])
+        store.evict()
+        return [spec["path"] for spec in specs]
+
+    processes = min(processes, len(specs))
+    if processes <= 1:
+        try:
+            return [render(spec, fast) for spec in specs]
+        finally:
+            release()
+
+    with multiprocessing.Pool(processes) as pool:
+        rendered = pool.map(render_worker, [(spec, fast, instrument.PROFILER.enabled) for spec in specs], chunksize=1)
+    for _, stages in rendered:
+        instrument.PROFILER.adopt(stages)
+    return [path for path, _ in rendered]
@@ -0,0 +1,133 @@
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+
+# GLOBAL VARIABLES
+# Most random draws held at once per block
+MAX_BLOCK = 1 << 23
+# Draws per seeded block, fixed so the draws of a seed do not depend on the worker count
+SEED_BLOCK = 250
+
+
+def seeded_blocks(draws, seed=None, streams=1):
+    """ (seed, size) of the fixed size blocks splitting some draws, per independent stream, e.g. one per table """
+    starts = range(0, draws, SEED_BLOCK)
+    seeds = np.random.SeedSequence(seed).spawn(streams * len(starts))
+    return [[(seeds[stream * len(starts) + block], min(SEED_BLOCK, draws - start))
+             for block, start in enumerate(starts)] for stream in range(streams)]
+
+
+def draw_rows(rng, count, size, replicates, replace=True):
+    """ Matrix of replicate row positions, one row of positions per replicate """
+    if replace:
+        return rng.integers(0, count, size=(replicates, size))
+
+    # Smallest random keys per replicate give a sample without duplicates
+    return np.argpartition(rng.random((replicates, count)), size - 1, axis=1)[:, :size]
+
+
+def count_replicates(cells, rows, cell_count):
+    """ Count cell codes for every replicate row matrix in one bincount """
+    sampled = cells[rows]
+    offset = np.arange(rows.shape[0], dtype=np.int64)[:, None] * cell_count
+    valid = sampled >= 0
+
+    return np.bincount((sampled + offset)[valid], minlength=rows.shape[0] * cell_count).reshape(rows.shape[0],
+                                                                                               cell_count)
+
+
+def replicate_block(args):
+    """ Replicate cell counts for one block of replicates, used per worker """
+    method, seed, replicates, size, replace, cell_counts, cells = args
+    rng = np.random.default_rng(seed)
+
+    if method == "multinomial":
+        if replace:
+            return rng.multinomial(size, cell_counts / cell_counts.sum(), size=replicates)
+        return rng.multivariate_hypergeometric(cell_counts, size, size=replicates)
+
+    # Index method draws rows, in blocks small enough to bound the index matrix
+    step = max(1, MAX_BLOCK // max(size if replace else len(cells), 1))
+    blocks = list()
+    for start in range(0, replicates, step):
+        rows = draw_rows(rng, len(cells), size, min(step, replicates - start), replace)
+        blocks.append(count_replicates(cells, rows, len(cell_counts)))
+
+    return np.concatenate(blocks)
+
+
+class Replicates:
+    """ Class holding group x outcome counts for every replicate """
+
+    def __init__(self, counts, group_labels, outcome_labels):
+        """ Constructor for Replicates """
+        self.counts = counts
+        self.group_labels = pd.Index(group_labels)
+        self.outcome_labels = pd.Index(outcome_labels)
+
+    def group_counts(self, outcome=None):
+        """ Per replicate count of each group, optionally for one outcome only """
+        if outcome is None:
+            return self.counts.sum(axis=2)
+        return self.counts[:, :, self.outcome_labels.get_loc(outcome)]
+
+    def rates(self, outcome):
+        """ Per replicate rate of an outcome within each group """
+        totals = self.group_counts()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.group_counts(outcome) / totals
+
+    def mean(self, outcome=None):
+        """ Per replicate ordinal mean of the group, ranking groups 1..n in label order """
+        counts = self.group_counts(outcome)
+        return counts @ np.arange(1, counts.shape[1] + 1) / counts.sum(axis=1)
+
+    def summary(self, outcome=None, level=0.95):
+        """ Percentile confidence intervals of group counts, rates and ordinal mean """
+        bounds = [(1 - level) / 2, 1 - (1 - level) / 2]
+        stats = dict({"count": self.group_counts(outcome)})
+        if outcome is not None:
+            stats["rate"] = self.rates(outcome)
+
+        frames = list()
+        for name, values in stats.items():
+            low, high = np.nanquantile(values, bounds, axis=0)
+            frames.append(pd.DataFrame({"stat": name, "estimate": np.nanmean(values, axis=0), "lower": low,
+                                        "upper": high}, index=self.group_labels))
+
+        low, high = np.nanquantile(self.mean(outcome), bounds)
+        frames.append(pd.DataFrame({"stat": "mean", "estimate": np.nanmean(self.mean(outcome)), "lower": low,
+                                    "upper": high}, index=pd.Index(["All"])))
+
+        return pd.concat(frames)
+
+
+def resample(dataset, group_col, outcome_col, replicates=1000, frac=1.0, replace=True, method="multinomial",
+             seed=None, processes=1):
+    """ Draw replicate crosstabs of a data set, bootstrap by default, subsample with replace=False """
+    table = dataset.crosstab(group_col, outcome_col)
+    cell_counts = table.to_numpy().ravel()
+    size = round(frac * cell_counts.sum())
+
+    # Index method needs each row's flat cell code, multinomial only needs the table
+    cells = None
+    if method == "index":
+        group_codes = dataset.codes(group_col).astype(np.int64)
+        outcome_codes = dataset.codes(outcome_col).astype(np.int64)
+        cells = np.where((group_codes < table.shape[0]) & (outcome_codes < table.shape[1]),
+                         group_codes * table.shape[1] + outcome_codes, -1)
+        size = round(frac * len(cells))
+
+    # Only the scheduling of the seeded blocks depends on processes
+    blocks = [(method, block_seed, block_size, size, replace, cell_counts, cells)
+              for block_seed, block_size in seeded_blocks(replicates, seed)[0]]
+
+    processes = max(1, min(processes, len(blocks)))
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            counts = pool.map(replicate_block, blocks)
+    else:
+        counts = [replicate_block(block) for block in blocks]
+
+    return Replicates(np.concatenate(counts).reshape(replicates, *table.shape), table.index, table.columns)
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import cache
+
+
+# GLOBAL VARIABLES
+RESULTS_FORMAT = 1
+MAX_BYTES = 256 << 20
+
+
+def result_key(*parts):
+    """ Content address of a result from json serializable parts, e.g. fingerprint, parameters and spec """
+    text = json.dumps([RESULTS_FORMAT, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def link(source, target):
+    """ Hard link source at target, copied instead across file systems """
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class ResultStore:
+    """ Class holding computed results by content address, least recently used evicted past a byte budget """
+
+    def __init__(self, root, max_bytes=MAX_BYTES):
+        """ Constructor for ResultStore """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key, suffix):
+        """ Stored file of a key, fanned out over subdirectories by key prefix """
+        return os.path.join(self.root, key[:2], f"{key}{suffix}")
+
+    def get(self, key, suffix):
+        """ Stored file of a key, touched as recently used, None on a miss """
+        path = self.path(key, suffix)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        os.utime(path)
+        return path
+
+    def put(self, key, suffix, source):
+        """ Store a file under a key """
+        path = self.path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with cache.swap_in(path) as temp_path:
+            link(source, temp_path)
+        return path
+
+    def fetch(self, key, suffix, target):
+        """ Link a stored result to target, False on a miss """
+        path = self.get(key, suffix)
+        if path is None:
+            return False
+        link(path, target)
+        return True
+
+    def get_array(self, key):
+        """ Stored array of a key, e.g. a count cube, None on a miss """
+        path = self.get(key, ".npy")
+        return np.load(path) if path else None
+
+    def put_array(self, key, values):
+        """ Store an array under a key """
+        path = self.path(key, ".npy")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with cache.swap_in(path, ".npy") as temp_path:
+            np.save(temp_path, values)
+
+    def evict(self):
+        """ Remove least recently used results until the store fits its budget """
+        files = list()
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, stat.st_size, os.path.join(directory, name)))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
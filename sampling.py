@@ -0,0 +1,127 @@
+import numpy as np
+
+
+# GLOBAL VARIABLES
+METHODS = ["random", "proportional", "neyman", "weighted"]
+
+
+def allocate(sizes, total, scores=None):
+    """ Rows per stratum summing to total, proportional to size (x score for Neyman), capped at each size """
+    sizes = np.asarray(sizes, dtype=np.int64)
+    total = min(int(total), int(sizes.sum()))
+    weight = sizes * (np.ones(len(sizes)) if scores is None else np.asarray(scores, dtype=float))
+    if not weight.any():
+        weight = sizes.astype(float)
+
+    # Strata whose share exceeds their size are taken whole, the rest is shared again among the others
+    allocation = np.zeros(len(sizes), dtype=np.int64)
+    active = weight > 0
+    while active.any():
+        remaining = total - allocation.sum()
+        share = np.where(active, remaining * weight / weight[active].sum(), 0)
+        full = active & (allocation + share >= sizes)
+        if not full.any():
+            # Largest remainder rounding keeps the sum exact
+            floor = np.floor(share).astype(np.int64)
+            allocation += floor
+            allocation[np.argsort(floor - share, kind="stable")[:remaining - floor.sum()]] += 1
+            break
+        allocation[full] = sizes[full]
+        active &= ~full
+
+    # Once every positive weight stratum is taken whole, the rest goes to the zero weight ones by size
+    leftover = total - allocation.sum()
+    if leftover:
+        allocation[weight <= 0] = allocate(sizes[weight <= 0], leftover)
+
+    return allocation
+
+
+def strata(codes, size):
+    """ Row ids of every category code, missing codes last, via one stable counting sort """
+    order = np.argsort(codes, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(codes, minlength=size + 1))[:-1])
+
+
+def neyman_scores(codes, size, indicator):
+    """ Standard deviation of a 0/1 row indicator within every stratum """
+    counts = np.bincount(codes, minlength=size + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.nan_to_num(np.bincount(codes, weights=indicator, minlength=size + 1) / counts)
+    return np.sqrt(share * (1 - share))
+
+
+def category_weights(codes, labels, weights=None):
+    """ Weight per category code, missing last, from a label dict or else inverse frequency to level groups """
+    if weights is None:
+        counts = np.bincount(codes, minlength=len(labels) + 1)
+        with np.errstate(divide="ignore"):
+            return np.where(counts > 0, 1 / counts, 0)
+    return np.array([weights.get(label, 1.0) for label in labels] + [weights.get(None, 1.0)], dtype=float)
+
+
+def weight_keys(rng, weights):
+    """ Efraimidis-Spirakis keys, the largest k give a weighted sample without replacement """
+    with np.errstate(divide="ignore"):
+        return np.log(rng.random(len(weights))) / weights
+
+
+class Sampler:
+    """ Class drawing row samples of one size, strata and weights prepared once for many draws """
+
+    def __init__(self, count, size, groups=None, allocation=None, weights=None):
+        """ Constructor for Sampler, stratified with groups and allocation, weighted with row weights """
+        self.count = count
+        self.size = size
+        self.groups = groups
+        self.allocation = allocation
+        self.weights = weights
+
+    def rows(self, rng):
+        """ Sorted row ids of one sample """
+        if self.groups is not None:
+            rows = [group[rng.choice(len(group), taken, replace=False)]
+                    for group, taken in zip(self.groups, self.allocation) if taken]
+            return np.sort(np.concatenate(rows)) if rows else np.zeros(0, dtype=np.int64)
+        if self.weights is not None:
+            if not self.size:
+                return np.zeros(0, dtype=np.int64)
+            return np.sort(np.argpartition(-weight_keys(rng, self.weights), self.size - 1)[:self.size])
+        return np.sort(rng.choice(self.count, self.size, replace=False))
+
+    def samples(self, samples, seed=None):
+        """ Row ids of several independent samples """
+        rng = np.random.default_rng(seed)
+        return [self.rows(rng) for _ in range(samples)]
+
+
+class Reservoir:
+    """ Class keeping a fixed size uniform, or weighted, sample of rows streamed in batches """
+
+    def __init__(self, size, seed=None, weights=None):
+        """ Constructor for Reservoir, weights maps a dimension to per category weights """
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.weights = weights
+        self.keys = np.zeros(0)
+        self.codes = dict()
+
+    def add(self, codes):
+        """ Merge a batch of binned codes, keeping the rows with the largest random keys """
+        rows = len(next(iter(codes.values())))
+        if self.weights:
+            dim, category_weights = next(iter(self.weights.items()))
+            keys = weight_keys(self.rng, category_weights[codes[dim]])
+        else:
+            keys = self.rng.random(rows)
+
+        # Only the current sample and the batch are ever held, whatever the stream length
+        keys = np.concatenate([self.keys, keys])
+        merged = {dim: np.concatenate([self.codes[dim], values]) if dim in self.codes else values
+                  for dim, values in codes.items()}
+        if len(keys) > self.size:
+            keep = np.sort(np.argpartition(-keys, self.size - 1)[:self.size])
+            keys = keys[keep]
+            merged = {dim: values[keep] for dim, values in merged.items()}
+        self.keys = keys
+        self.codes = merged
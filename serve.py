@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import time
+import traceback
+import urllib.parse
+import binning
+import rates
+import render
+from main import DataSet, JUSTIFIED, OUTCOME_BARS, PATH
+
+
+# GLOBAL VARIABLES
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_BYTES = 64 << 20
+MAX_HEADER_LINES = 100
+MAX_VIEWS = 64
+STATUS = dict({200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               431: "Request Header Fields Too Large", 500: "Internal Server Error"})
+
+
+class QueryError(Exception):
+    """ Invalid query, answered with 400 """
+
+
+class RequestTooLong(Exception):
+    """ Request or header line past the stream limit, answered with its status before closing """
+
+    def __init__(self, status, message):
+        """ Constructor for RequestTooLong """
+        super().__init__(message)
+        self.status = status
+
+
+class ResponseCache:
+    """ Class holding responses, mostly rendered pngs, by query, least recently used evicted past a byte budget """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        """ Constructor for ResponseCache """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Cached (content type, body) of a query, None on a miss """
+        response = self.entries.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        """ Store a (content type, body) response, evicting the least recently used ones past the budget """
+        if key in self.entries:
+            self.bytes -= len(self.entries.pop(key)[1])
+        self.entries[key] = response
+        self.bytes += len(response[1])
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            self.bytes -= len(self.entries.popitem(last=False)[1][1])
+
+
+class Service:
+    """ Class answering crosstab, rate and chart queries over one resident data set """
+
+    def __init__(self, dataset, cache_bytes=CACHE_BYTES):
+        """ Constructor for Service, the data set is processed once up front """
+        self.dataset = dataset
+        self.responses = ResponseCache(cache_bytes)
+        self.views = collections.OrderedDict()
+        # Matplotlib templates are per process state, so renders run one at a time off the event loop
+        self.renderer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.routes = dict({"/health": self.health, "/crosstab": self.crosstab, "/rates": self.rates,
+                            "/chart": self.chart})
+
+    def view(self, filters):
+        """ Data set filtered by dim=label pairs, each view filtered once and kept, least recently used dropped """
+        if not filters:
+            return self.dataset
+        if filters in self.views:
+            self.views.move_to_end(filters)
+        else:
+            self.views[filters] = self.dataset.filter(**dict(filters))
+            if len(self.views) > MAX_VIEWS:
+                self.views.popitem(last=False)
+        return self.views[filters]
+
+    def parse(self, params, names):
+        """ Named parameters and the data set view of the remaining dim=label filters """
+        unknown = set(params) - set(names) - set(binning.DIMENSIONS)
+        if unknown:
+            raise QueryError(f'Unknown parameters {", ".join(sorted(unknown))}')
+        for name in ["group", "outcome"]:
+            if name in names and params.get(name, names[name]) not in self.dataset.vocab:
+                raise QueryError(f'Unknown {name} {params.get(name)}, one of {", ".join(self.dataset.vocab)}')
+
+        filters = tuple(sorted((dim, label) for dim, label in params.items() if dim not in names))
+        for dim, label in filters:
+            if label not in self.dataset.labels(dim):
+                raise QueryError(f"Unknown {dim} label {label}")
+        return {name: params.get(name, default) for name, default in names.items()}, self.view(filters)
+
+    async def health(self, params):
+        """ Liveness and cache statistics """
+        cached = self.responses
+        return 200, "application/json", json.dumps(dict({"rows": int(self.dataset.count_cube.counts.sum()),
+                                                         "cached": len(cached.entries), "cached_bytes": cached.bytes,
+                                                         "hits": cached.hits, "misses": cached.misses}))
+
+    async def crosstab(self, params):
+        """ Group x outcome counts as json """
+        args, dataset = self.parse(params, dict({"group": "race", "outcome": "manner"}))
+        table = dataset.crosstab(args["group"], args["outcome"])
+        return 200, "application/json", table.to_json(orient="split")
+
+    async def rates(self, params):
+        """ Rates and intervals of every outcome within every group as json """
+        args, dataset = self.parse(params, dict({"group": "race", "outcome": "manner", "method": "wilson",
+                                                 "level": "0.95"}))
+        if args["method"] not in rates.INTERVALS:
+            raise QueryError(f'Unknown method {args["method"]}, one of {", ".join(rates.INTERVALS)}')
+        try:
+            level = float(args["level"])
+        except ValueError:
+            raise QueryError(f'Level {args["level"]} is not a number')
+        if not 0 < level < 1:
+            raise QueryError(f"Level {level} is not between 0 and 1")
+        table = rates.rates(dataset, args["group"], args["outcome"], args["method"], level).long()
+        return 200, "application/json", table.reset_index().to_json(orient="records")
+
+    def chart_spec(self, dataset, args):
+        """ Figure spec of a chart query, grouped bars of counts or one outcome's rates """
+        group, outcome = args["group"], args["outcome"]
+        if args["kind"] == "hist":
+            if outcome not in OUTCOME_BARS:
+                raise QueryError(f'Histograms need an outcome of {", ".join(OUTCOME_BARS)}')
+            title = f"Number of Deaths per {group.capitalize()} by {outcome.capitalize()}"
+            return dataset.hist_spec(dataset.crosstab(group, outcome), dataset.labels(group), OUTCOME_BARS[outcome],
+                                     f"{group.capitalize()} Labels", title, "chart.png")
+        if args["kind"] == "rate":
+            if args["label"] not in dataset.labels(outcome):
+                raise QueryError(f'Unknown {outcome} label {args["label"]}')
+            summary = rates.rates(dataset, group, outcome).summary(args["label"])
+            return dict({"kind": "bar", "path": "chart.png", "x_labels": list(summary.index),
+                         "values": summary["rate"].tolist(), "lower": summary["lower"].tolist(),
+                         "upper": summary["upper"].tolist(), "x_name": f"{group.capitalize()} Labels",
+                         "y_name": "Ratio of Total Deaths", "title": f'Ratio of {args["label"]} Deaths'})
+        raise QueryError(f'Unknown chart kind {args["kind"]}, one of hist, rate')
+
+    async def chart(self, params):
+        """ Rendered png of a chart query """
+        args, dataset = self.parse(params, dict({"kind": "hist", "group": "race", "outcome": "manner",
+                                                 "label": JUSTIFIED}))
+        spec = self.chart_spec(dataset, args)
+        png = await asyncio.get_running_loop().run_in_executor(self.renderer, render.render_png, spec, True)
+        return 200, "image/png", png
+
+    async def answer(self, method, target):
+        """ Status, content type and body of one request, repeated queries straight from the response cache """
+        url = urllib.parse.urlsplit(target)
+        if url.path not in self.routes:
+            return 404, "application/json", json.dumps(dict({"error": f"No route {url.path}"}))
+        if method != "GET":
+            return 405, "application/json", json.dumps(dict({"error": "Only GET is supported"}))
+
+        # Parameter order does not change the answer, so it is not part of the key
+        params = dict(urllib.parse.parse_qsl(url.query))
+        key = (url.path, tuple(sorted(params.items())))
+        cached = self.responses.get(key) if url.path != "/health" else None
+        if cached:
+            return (200, *cached)
+        try:
+            status, content_type, body = await self.routes[url.path](params)
+        except QueryError as error:
+            return 400, "application/json", json.dumps(dict({"error": str(error)}))
+        except Exception:
+            traceback.print_exc()
+            return 500, "application/json", json.dumps(dict({"error": "Internal error, see the server log"}))
+
+        if url.path != "/health":
+            self.responses.put(key, (content_type, body.encode() if isinstance(body, str) else body))
+        return status, content_type, body
+
+    @staticmethod
+    async def read_request(reader):
+        """ Request line and lower cased headers of the next request, an empty line once the client closed """
+        try:
+            request = await reader.readline()
+        except ValueError:
+            raise RequestTooLong(400, "Request line too long")
+        headers = dict()
+        for _ in range(MAX_HEADER_LINES if request else 0):
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise RequestTooLong(431, "Header line too long")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request, headers
+
+    @staticmethod
+    async def respond(writer, status, content_type, body, elapsed, close):
+        """ Write one http/1.1 response """
+        body = body.encode() if isinstance(body, str) else body
+        writer.write((f"HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: {content_type}\r\n"
+                      f"Content-Length: {len(body)}\r\nServer-Timing: total;dur={elapsed:.2f}\r\n"
+                      f'Connection: {"close" if close else "keep-alive"}\r\n\r\n').encode() + body)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        """ Serve http/1.1 requests of one connection, kept alive until the client closes it """
+        try:
+            while True:
+                try:
+                    request, headers = await self.read_request(reader)
+                except RequestTooLong as error:
+                    # A line past the stream limit is left partly unread, so answer and close
+                    await self.respond(writer, error.status, "application/json",
+                                       json.dumps(dict({"error": str(error)})), 0, True)
+                    break
+                if not request:
+                    break
+
+                start = time.perf_counter()
+                parts = request.decode("latin-1").split()
+                if len(parts) != 3:
+                    status, content_type, body = 400, "application/json", json.dumps(dict({"error": "Bad request"}))
+                else:
+                    status, content_type, body = await self.answer(parts[0], parts[1])
+
+                close = headers.get("connection", "").lower() == "close"
+                await self.respond(writer, status, content_type, body, 1000 * (time.perf_counter() - start), close)
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        """ Accept connections until cancelled """
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f'Serving {self.dataset.file} on http://{host}:{port} (/crosstab, /rates, /chart, /health)')
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    """ Main """
+    parser = argparse.ArgumentParser(description="Serve Deaths In Custody queries over http from one resident data set")
+    parser.add_argument("--file", help="csv to serve, defaults to the Deaths In Custody data set",
+                        default=os.path.join(os.path.join(PATH, "data"), "DeathInCustody_2005-2020_20210603.csv"))
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--no-cache", action="store_true", help="re-parse and re-bin the csv, ignoring the cache")
+    parser.add_argument("--cache-mb", type=int, default=CACHE_BYTES >> 20, help="memory budget of cached pngs")
+    args = parser.parse_args(argv)
+
+    dataset = DataSet(args.file, "", cache_dir=None if args.no_cache else os.path.join(PATH, "cache"))
+    dataset.process()
+    # Count everything once up front, so the first query is as fast as the rest
+    dataset.count_all()
+
+    asyncio.run(Service(dataset, args.cache_mb << 20).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def category_counts(dataset, col, outcome_col=None, outcome=None):
+    """ Count per category of a column, optionally only rows with one outcome """
+    if outcome_col is None:
+        return dataset.value_counts(col)
+    return dataset.crosstab(col, outcome_col)[outcome]
+
+
+def mean(counts):
+    """ Ordinal mean of counted categories, ranking them 1..n in category order, NaN when nothing is counted """
+    if not counts.sum():
+        return float("nan")
+    return float(np.arange(1, len(counts) + 1) @ counts.to_numpy() / counts.sum())
+
+
+def median(counts):
+    """ Category at the middle position (count/2) of the rows sorted in category order, None when nothing is counted """
+    if not counts.sum():
+        return None
+    return counts.index[np.searchsorted(np.cumsum(counts.to_numpy()), int(counts.sum() / 2), side="right")]
+
+
+def mode(counts):
+    """ Most frequent category, None when nothing is counted """
+    if not counts.sum():
+        return None
+    return counts.index[np.argmax(counts.to_numpy())]
+
+
+def describe(dataset, col, outcome_col=None, outcome=None):
+    """ Counts, ordinal mean, median and mode of a column in one counting pass """
+    counts = category_counts(dataset, col, outcome_col, outcome)
+
+    return dict({"counts": counts, "mean": mean(counts), "median": median(counts), "mode": mode(counts)})
+
@@ -0,0 +1,86 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+
+# GLOBAL VARIABLES
+SIZES = {"10k": 10_000, "1m": 1_000_000, "50m": 50_000_000}
+CHUNK_ROWS = 1_000_000
+
+# Raw category weights, skewed like the 2005-2020 release
+AGENCIES = {"CDCR": 40, "Los Angeles County Sheriff": 20, "San Diego County Sheriff": 8, "Los Angeles Police": 7,
+            "Riverside County Sheriff": 6, "Orange County Sheriff": 5, "Fresno County Sheriff": 4,
+            "Sacramento County Sheriff": 4, "San Francisco Police": 3, "Oakland Police": 3}
+RACES = {"Hispanic": 36, "White": 34, "Black": 21, "Other": 3.2, "American Indian": 0.9, "Filipino": 1.0,
+         "Other Asian": 0.8, "Vietnamese": 0.6, "Chinese": 0.4, "Korean": 0.3, "Pacific Islander": 0.3,
+         "Japanese": 0.2, "Asian Indian": 0.2, "Laotian": 0.15, "Cambodian": 0.15, "Samoan": 0.15,
+         "Hawaiian": 0.1, "Guamanian": 0.05}
+GENDERS = {"Male": 94, "Female": 6}
+OFFENSES = {"Felony": 55, "Misdemeanor": 25, "None": 15, "Unknown": 5}
+
+# Custody status first, manner of death then depends on it
+CUSTODY = {"Sentenced": 56, "Process of Arrest": 16, "Booked - Awaiting Trial": 16, "Booked - No Charges Filed": 3,
+           "Awaiting Booking": 3, "Other": 3, "In Transit": 2, "Out to Court": 1}
+MANNER = ["Natural", "Accidental", "Suicide", "Cannot be Determined", "Homicide Willful (Other Inmate)",
+          "Homicide Justified (Law Enforcement Staff)", "Other", "Homicide Willful (Law Enforcement Staff)",
+          "Execution", "Pending Investigation", "Homicide Justified (Other Inmate)"]
+MANNER_BY_CUSTODY = {"Sentenced": [70, 6, 12, 2, 4, 0.5, 1, 0.1, 0.3, 4, 0.1],
+                     "Process of Arrest": [4, 12, 2, 4, 0.1, 66, 2, 1, 0, 9, 0],
+                     "Booked - Awaiting Trial": [35, 20, 30, 3, 3, 0.5, 2, 0.2, 0, 6, 0.3]}
+MANNER_DEFAULT = [30, 25, 20, 5, 1, 5, 4, 0.5, 0, 9, 0.5]
+
+
+def choice(rng, weights, rows):
+    """ Draw labels from a dict of raw weights """
+    labels = np.array(list(weights), dtype=object)
+    probs = np.array(list(weights.values()), dtype=float)
+    return labels[rng.choice(len(labels), size=rows, p=probs / probs.sum())]
+
+
+def generate_chunk(rng, rows):
+    """ One frame of synthetic rows with the Deaths In Custody schema """
+    custody = choice(rng, CUSTODY, rows)
+    manner = np.empty(rows, dtype=object)
+    for status in CUSTODY:
+        mask = custody == status
+        weights = np.array(MANNER_BY_CUSTODY.get(status, MANNER_DEFAULT), dtype=float)
+        manner[mask] = np.array(MANNER, dtype=object)[rng.choice(len(MANNER), size=mask.sum(),
+                                                                  p=weights / weights.sum())]
+
+    # Ages cluster in the 20s-50s with a long tail, a few are unknown
+    ages = np.clip(rng.gamma(6.5, 6.5, size=rows) + 10, 14, 99).astype(int).astype(str).astype(object)
+    ages[rng.random(rows) < 0.01] = "Unk"
+
+    agency = choice(rng, AGENCIES, rows)
+    return pd.DataFrame({"reporting_agency": agency, "agency_name": agency,
+                         "date_of_death_yyyy": rng.integers(2005, 2021, size=rows),
+                         "date_of_death_mm": rng.integers(1, 13, size=rows),
+                         "date_of_death_dd": rng.integers(1, 29, size=rows),
+                         "race": choice(rng, RACES, rows), "gender": choice(rng, GENDERS, rows), "age": ages,
+                         "custody_status": custody, "custody_offense": choice(rng, OFFENSES, rows),
+                         "manner_of_death": manner})
+
+
+def generate(file, rows, seed=0):
+    """ Write a synthetic csv chunk by chunk, so any size fits in memory """
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, CHUNK_ROWS):
+        chunk = generate_chunk(rng, min(CHUNK_ROWS, rows - start))
+        chunk.to_csv(file, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+    return file
+
+
+def main():
+    """ Main """
+    parser = argparse.ArgumentParser(description="Synthetic Deaths In Custody csv generator")
+    parser.add_argument("rows", help=f"row count or one of {', '.join(SIZES)}")
+    parser.add_argument("file", help="csv file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.file, SIZES.get(args.rows) or int(args.rows), args.seed)
+
+
+if __name__ == "__main__":
+    main()
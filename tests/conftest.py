@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+
+# Modules live flat in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import synth
+
+
+@pytest.fixture(scope="session")
+def fixture_csv(tmp_path_factory):
+    """ Small synthetic csv covering every race label and unknown ages """
+    return synth.generate(str(tmp_path_factory.mktemp("data") / "fixture.csv"), 3000, seed=7)
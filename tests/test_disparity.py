@@ -0,0 +1,59 @@
+import math
+import numpy as np
+import pytest
+import disparity
+from main import DataSet
+
+
+def even_sf(x, df):
+    """ Closed form chi-square upper tail for even degrees of freedom """
+    return math.exp(-x / 2) * sum((x / 2) ** i / math.factorial(i) for i in range(df // 2))
+
+
+@pytest.mark.parametrize("df", [2, 4, 6, 10, 20, 40])
+@pytest.mark.parametrize("x", [0.01, 0.5, 1.0, 3.0, 7.5, 15.0, 30.0, 60.0, 120.0])
+def test_chi2_sf_even(x, df):
+    """ Series and continued fraction branches both match the closed form tail """
+    expected = even_sf(x, df)
+    assert disparity.chi2_sf(np.array([x]), np.array([df]))[0] == pytest.approx(expected, rel=1e-9, abs=1e-300)
+
+
+@pytest.mark.parametrize("x", [0.1, 1.0, 3.84, 10.0])
+def test_chi2_sf_one(x):
+    """ One degree of freedom is the two sided normal tail """
+    assert disparity.chi2_sf(np.array([x]), np.array([1]))[0] == pytest.approx(math.erfc(math.sqrt(x / 2)), rel=1e-9)
+
+
+def test_chi2_sf_edges():
+    """ Zero statistic has tail 1, no degrees of freedom gives nan, shapes are kept """
+    values = disparity.chi2_sf(np.array([[0.0, 5.0]]), np.array([[3, 0]]))
+    assert values.shape == (1, 2) and values[0, 0] == 1.0 and np.isnan(values[0, 1])
+
+
+def test_permutation_null():
+    """ Shuffles of an independent table follow the chi-square null, mean df and about 5% past the critical value """
+    table = np.outer([100, 200, 300], [0.2, 0.3, 0.5]).round()
+    null = disparity.permutation_stats([table], 4000, seed=3)[0]
+    assert len(null) == 4000
+    assert null.mean() == pytest.approx(4, abs=0.25)
+    assert np.mean(null >= 9.4877) == pytest.approx(0.05, abs=0.015)
+
+
+@pytest.fixture(scope="module")
+def dataset(fixture_csv):
+    """ Processed data set of the fixture, no cache """
+    dataset = DataSet(fixture_csv, None, cache_dir=None)
+    dataset.process()
+    return dataset
+
+
+def test_permutation_p(dataset):
+    """ Permutation p values are valid, tiny for dependent tables and seeded independently of processes """
+    summary = disparity.battery(dataset, ["race", "custody"], ["manner"], permutations=500, seed=1).summary
+    assert ((summary["permutation_p"] > 0) & (summary["permutation_p"] <= 1)).all()
+    # Synthetic manner of death depends on custody status only
+    assert summary.loc[("custody", "manner"), "permutation_p"] == 1 / 501
+    assert summary.loc[("race", "manner"), "permutation_p"] > 0.01
+
+    parallel = disparity.battery(dataset, ["race", "custody"], ["manner"], permutations=500, seed=1, processes=2)
+    assert parallel.summary["permutation_p"].equals(summary["permutation_p"])
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+import incremental
+from main import DataSet
+
+
+def process(file, state_dir):
+    """ Incremental data set of a release, counting only rows new since the stored state """
+    dataset = DataSet(file, None, cache_dir=None, state_dir=str(state_dir))
+    dataset.process()
+    return dataset
+
+
+def recount(file):
+    """ Count cube of a release counted from scratch """
+    dataset = DataSet(file, None, cache_dir=None)
+    dataset.process()
+    return dataset.count_all().counts
+
+
+@pytest.fixture(scope="module")
+def frame(fixture_csv):
+    """ Raw fixture rows """
+    return pd.read_csv(fixture_csv)
+
+
+def write(frame, path):
+    """ Write a release csv and return its path """
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_new_rows():
+    """ A hash stored k times skips its first k rows, whatever their order """
+    known, counts = np.array([3, 5, 9], dtype=np.uint64), np.array([1, 2, 1])
+    hashes = np.array([5, 1, 3, 5, 5, 9, 3, 7], dtype=np.uint64)
+    assert incremental.new_rows(hashes, known, counts).tolist() == [1, 4, 6, 7]
+    assert incremental.new_rows(hashes, known[:0], counts[:0]).tolist() == list(range(len(hashes)))
+
+
+def test_removed_rows():
+    """ Stored rows missing from a release are counted with their multiplicity """
+    known, counts = np.array([3, 5, 9], dtype=np.uint64), np.array([1, 2, 1])
+    assert incremental.removed_rows(np.array([3, 5, 5, 9, 11], dtype=np.uint64), known, counts) == 0
+    assert incremental.removed_rows(np.array([3, 5, 11], dtype=np.uint64), known, counts) == 2
+
+
+def test_append(frame, tmp_path):
+    """ An appended release only counts its new rows and matches a full recount """
+    state_dir = tmp_path / "state"
+    first = process(write(frame.iloc[:2000], tmp_path / "first.csv"), state_dir)
+    assert first.delta == 2000
+
+    # Duplicates of already stored rows are new rows too
+    release = pd.concat([frame, frame.iloc[:5]])
+    second = process(write(release, tmp_path / "second.csv"), state_dir)
+    assert second.delta == len(release) - 2000
+    assert (second.count_all().counts == recount(str(tmp_path / "second.csv"))).all()
+
+    # An unchanged release counts nothing
+    assert process(str(tmp_path / "second.csv"), state_dir).delta == 0
+
+
+@pytest.mark.parametrize("change", ["dropped", "edited"])
+def test_recount(frame, tmp_path, change):
+    """ A release missing or editing a stored row recounts every row """
+    state_dir = tmp_path / "state"
+    process(write(frame, tmp_path / "first.csv"), state_dir)
+
+    release = frame.drop(index=10) if change == "dropped" else frame.copy()
+    if change == "edited":
+        release.loc[10, "race"] = "Black" if release.loc[10, "race"] != "Black" else "White"
+    dataset = process(write(release, tmp_path / "second.csv"), state_dir)
+    assert dataset.delta == len(release)
+    assert (dataset.count_all().counts == recount(str(tmp_path / "second.csv"))).all()
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+import binning
+from main import DataSet
+
+
+# GLOBAL VARIABLES
+ASIAN_OCEANIC = ["Other Asian", "Filipino", "Vietnamese", "Asian Indian", "Pacific Islander", "Korean", "Chinese",
+                 "Laotian", "Samoan", "Cambodian", "Japanese", "Hawaiian", "Guamanian"]
+OUTCOME_COLUMNS = dict({"manner": "manner_of_death", "custody": "custody_status"})
+
+
+def legacy_race(column):
+    """ Race binned by the original per-row loop """
+    race = column.copy()
+    for index, label in column.items():
+        if label in ASIAN_OCEANIC:
+            race[index] = "Asian/Oceanic"
+    return race
+
+
+def legacy_age(column):
+    """ Age binned by the original per-row loop """
+    age = column.copy()
+    for index, label in column.items():
+        if label == "Unk":
+            age[index] = "Unknown"
+        elif int(label) <= 29:
+            age[index] = "0-29"
+        elif int(label) <= 39:
+            age[index] = "30-39"
+        elif int(label) <= 49:
+            age[index] = "40-49"
+        elif int(label) <= 59:
+            age[index] = "50-59"
+        elif int(label) <= 69:
+            age[index] = "60-69"
+        else:
+            age[index] = "70+"
+    return age
+
+
+def legacy_counts(groups, outcomes):
+    """ Outcome counts per group, dict of dicts as the original histogram loops built them """
+    counts = dict()
+    for index, group in groups.items():
+        counts.setdefault(group, dict())
+        counts[group][outcomes[index]] = counts[group].get(outcomes[index], 0) + 1
+    return counts
+
+
+@pytest.fixture(scope="module")
+def frame(fixture_csv):
+    """ Raw fixture rows, as the original code read them """
+    return pd.read_csv(fixture_csv)
+
+
+@pytest.fixture(scope="module")
+def dataset(fixture_csv):
+    """ Processed data set of the fixture, no cache """
+    dataset = DataSet(fixture_csv, None, cache_dir=None)
+    dataset.process()
+    return dataset
+
+
+@pytest.mark.parametrize("dim, legacy", [("race", legacy_race), ("age", legacy_age)])
+def test_bin_dimension(frame, dim, legacy):
+    """ Vectorized binning labels every row as the per-row loop did """
+    config = binning.load_config()
+    labels = binning.to_categorical(binning.bin_dimension(frame, config, dim), config[dim]["categories"])
+    assert list(labels.astype(object)) == list(legacy(frame[dim]))
+
+
+@pytest.mark.parametrize("group", ["race", "age", "gender"])
+@pytest.mark.parametrize("outcome", ["manner", "custody"])
+def test_crosstab(frame, dataset, group, outcome):
+    """ Crosstab counts match the original dict counting loops """
+    groups = dict({"race": legacy_race, "age": legacy_age}).get(group, lambda column: column)(frame[group])
+    expected = legacy_counts(groups, frame[OUTCOME_COLUMNS[outcome]])
+    table = dataset.crosstab(group, outcome)
+
+    assert set(expected) <= set(table.index)
+    assert table.to_numpy().sum() == len(frame)
+    for label in table.index:
+        for category in table.columns:
+            assert table.loc[label, category] == expected.get(label, dict()).get(category, 0)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+import sampling
+
+
+@pytest.mark.parametrize("sizes, total, scores, expected", [
+    ([10, 10, 100], 60, None, [5, 5, 50]),
+    ([10, 10, 100], 60, [1, 1, 0], [10, 10, 40]),
+    ([10, 10, 100], 30, [1, 1, 0], [10, 10, 10]),
+    ([10, 20, 30], 60, [0.5, 0, 0.1], [10, 20, 30]),
+    ([0, 5, 7], 12, [0, 0, 0], [0, 5, 7]),
+    ([3, 100], 50, [10, 1], [3, 47]),
+])
+def test_allocate(sizes, total, scores, expected):
+    """ Allocations are capped at each stratum, zero weight strata only take what the others cannot """
+    assert sampling.allocate(sizes, total, scores).tolist() == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_allocate_sums_to_total(seed):
+    """ Any sizes, scores and total give an allocation summing to the total, never above a stratum's size """
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(0, 50, size=rng.integers(1, 8))
+    scores = rng.random(len(sizes)) * (rng.random(len(sizes)) < 0.6)
+    total = rng.integers(0, sizes.sum() + 10)
+    allocation = sampling.allocate(sizes, total, scores)
+
+    assert allocation.sum() == min(total, sizes.sum())
+    assert (allocation >= 0).all() and (allocation <= sizes).all()
@@ -0,0 +1,51 @@
+import math
+import pytest
+import stats
+from main import DataSet
+
+
+# GLOBAL VARIABLES
+GROUPS = ["race", "age", "gender", "year"]
+OUTCOMES = ["manner", "custody"]
+
+
+@pytest.fixture(scope="module")
+def dataset(fixture_csv):
+    """ Processed in memory data set of the fixture, no cache """
+    dataset = DataSet(fixture_csv, None, cache_dir=None)
+    dataset.process()
+    return dataset
+
+
+@pytest.fixture(scope="module", params=[1000, 1024, 2999])
+def streamed(fixture_csv, request):
+    """ Data set of the fixture streamed in chunks, holding only counts """
+    streamed = DataSet(fixture_csv, None, cache_dir=None, chunksize=request.param)
+    streamed.process()
+    return streamed
+
+
+def test_value_counts(dataset, streamed):
+    """ Streamed category counts match the in memory ones """
+    assert streamed.streamed
+    for dim in GROUPS + OUTCOMES:
+        assert streamed.value_counts(dim).equals(dataset.value_counts(dim))
+
+
+@pytest.mark.parametrize("group", GROUPS)
+@pytest.mark.parametrize("outcome", OUTCOMES)
+def test_crosstab(dataset, streamed, group, outcome):
+    """ Streamed crosstabs match the in memory ones """
+    assert streamed.crosstab(group, outcome).equals(dataset.crosstab(group, outcome))
+
+
+@pytest.mark.parametrize("group", ["race", "age", "gender"])
+@pytest.mark.parametrize("outcome", OUTCOMES)
+def test_describe(dataset, streamed, group, outcome):
+    """ Summary statistics of every outcome label match the in memory ones """
+    for label in dataset.labels(outcome):
+        expected = stats.describe(dataset, group, outcome, label)
+        described = stats.describe(streamed, group, outcome, label)
+        assert described["counts"].equals(expected["counts"])
+        assert described["median"] == expected["median"] and described["mode"] == expected["mode"]
+        assert described["mean"] == expected["mean"] or math.isnan(described["mean"]) and math.isnan(expected["mean"])
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+
+def rolling_sum(counts, window):
+    """ Trailing window sums along the first axis from one cumulative sum, partial windows at the start """
+    total = np.cumsum(counts, axis=0)
+    rolled = total.copy()
+    rolled[window:] -= total[:-window]
+    return rolled
+
+
+class Cube:
+    """ Class holding time x group x outcome counts """
+
+    def __init__(self, counts, time_labels, group_labels, outcome_labels, totals=None):
+        """ Constructor for Cube, totals are time x group row counts including rows missing the outcome """
+        self.counts = counts
+        self.totals = counts.sum(axis=2) if totals is None else totals
+        self.time_labels = pd.Index(time_labels)
+        self.group_labels = pd.Index(group_labels)
+        self.outcome_labels = pd.Index(outcome_labels)
+
+    def with_counts(self, counts, totals):
+        """ Cube over the same labels with other counts """
+        return Cube(counts, self.time_labels, self.group_labels, self.outcome_labels, totals)
+
+    def rolling(self, window):
+        """ Cube of trailing window sums over time periods, every slice at once """
+        return self.with_counts(rolling_sum(self.counts, window), rolling_sum(self.totals, window))
+
+    def cumulative(self):
+        """ Cube of running totals over time periods """
+        return self.with_counts(np.cumsum(self.counts, axis=0), np.cumsum(self.totals, axis=0))
+
+    def frame(self, outcome=None):
+        """ Time x group counts of one outcome, or of all outcomes """
+        if outcome is None:
+            values = self.counts.sum(axis=2)
+        else:
+            values = self.counts[:, :, self.outcome_labels.get_loc(outcome)]
+
+        return pd.DataFrame(values, index=self.time_labels, columns=self.group_labels)
+
+    def rates(self, outcome):
+        """ Time x group rate of an outcome among all of each group's rows of that period, as rates.rates """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.frame(outcome) / pd.DataFrame(self.totals, index=self.time_labels, columns=self.group_labels)